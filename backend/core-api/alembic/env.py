@@ -31,6 +31,12 @@ from src.task.models import Task
 from src.event.models import LastEvent
 from src.auth.models import Token
 from src.auth.models import GitHubToken
+from src.event.models import EventDelivery
+from src.event.models import EventLog
+from src.job.models import ReactionDeadLetter
+from src.job.models import ReactionExecution
+from src.job.models import ReactionJob
+from src.digest.models import DigestEntry
 
 # Set target_metadata
 target_metadata = Base.metadata
@@ -0,0 +1,47 @@
+"""add email filter columns to task
+
+Revision ID: 8c41f0d2a7e3
+Revises: 12e6a3665f7f
+Create Date: 2024-11-12 10:04:51.672190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41f0d2a7e3'
+down_revision: Union[str, None] = '12e6a3665f7f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('task', sa.Column('email_filter', sa.String(), nullable=True))
+    op.add_column('task', sa.Column('email_filter_address', sa.String(), nullable=True))
+
+    # Backfill from trigger_args = [project, topic, email, "only_from" | "only_to"] (postgres arrays are 1-based)
+    op.execute(
+        """
+        UPDATE task
+        SET email_filter = trigger_args[4], email_filter_address = trigger_args[3]
+        WHERE array_length(trigger_args, 1) >= 4 AND trigger_args[4] IN ('only_from', 'only_to')
+        """
+    )
+
+    op.create_index(
+        'ix_task_user_id_trigger_email_filter',
+        'task',
+        ['user_id', 'trigger', 'email_filter', 'email_filter_address'],
+        unique=False,
+    )
+    op.create_index(op.f('ix_user_email'), 'user', ['email'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_user_email'), table_name='user')
+    op.drop_index('ix_task_user_id_trigger_email_filter', table_name='task')
+    op.drop_column('task', 'email_filter_address')
+    op.drop_column('task', 'email_filter')
@@ -12,6 +12,8 @@ from starlette import status
 from web3 import Web3
 
 from src.auth.config import auth_setting
+from src.provider.config import provider_setting
+from src.provider.service import provider_call
 
 bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -111,11 +113,17 @@ def send_usdc(to_address: str, token_amount: int):
     if not auth_setting.ZK_SYNC_SEPOLIA_RPC_URL:
         raise ValueError("RPC URL not provided.")
 
-    w3 = Web3(Web3.HTTPProvider(auth_setting.ZK_SYNC_SEPOLIA_RPC_URL))
+    w3 = Web3(
+        Web3.HTTPProvider(
+            auth_setting.ZK_SYNC_SEPOLIA_RPC_URL,
+            request_kwargs={"timeout": provider_setting.PROVIDER_REQUEST_TIMEOUT_SECONDS},
+        )
+    )
 
     # Check for connection to the Ethereum network
-    if not w3.is_connected():
-        raise ConnectionError("Failed to connect to HTTPProvider")
+    with provider_call("zksync_rpc", sends=False):
+        if not w3.is_connected():
+            raise ConnectionError("Failed to connect to HTTPProvider")
 
     contract_abi = [
         {
@@ -144,28 +152,33 @@ def send_usdc(to_address: str, token_amount: int):
 
     usdc_contract = w3.eth.contract(address=usdc_address, abi=contract_abi)
 
-    nonce = w3.eth.get_transaction_count(w3.eth.account.from_key(auth_setting.CRYPTO_PAYMENTS_PRIVATE_KEY).address)
-
     scaled_amount = token_amount
 
-    transaction = usdc_contract.functions.transfer(sanitized_to_address, scaled_amount).build_transaction(
-        {
-            "chainId": 300,
-            "gas": 6000000,
-            "gasPrice": w3.eth.gas_price,
-            "nonce": nonce,
-        }
-    )
+    with provider_call("zksync_rpc", tokens=2, sends=False):  # Nonce and gas price
+        nonce = w3.eth.get_transaction_count(
+            w3.eth.account.from_key(auth_setting.CRYPTO_PAYMENTS_PRIVATE_KEY).address
+        )
+        transaction = usdc_contract.functions.transfer(sanitized_to_address, scaled_amount).build_transaction(
+            {
+                "chainId": 300,
+                "gas": 6000000,
+                "gasPrice": w3.eth.gas_price,
+                "nonce": nonce,
+            }
+        )
 
     # Sign the transaction with the private key
     signed_txn = w3.eth.account.sign_transaction(transaction, auth_setting.CRYPTO_PAYMENTS_PRIVATE_KEY)
 
     # Attempt to send the transaction
     try:
-        tx_hash = w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+        with provider_call("zksync_rpc"):
+            tx_hash = w3.eth.send_raw_transaction(signed_txn.raw_transaction)
         print(f"Transaction sent! Hash: {tx_hash.hex()}")
     except Exception as e:
+        # Raised again so the job is retried (or dead-lettered) and the circuit breaker sees it
         print(f"Error sending transaction: {e}")
+        raise
 
 
 def get_google_jwk():
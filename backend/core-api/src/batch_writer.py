@@ -0,0 +1,80 @@
+# Background writer for append-only tables: rows are buffered in memory and inserted in bulk by a daemon thread,
+# so the request or reaction that produced them never waits on the insert.
+import queue
+import threading
+import traceback
+from collections.abc import Iterable
+
+from sqlalchemy import insert
+
+from src.database import SessionLocal
+
+
+class BatchWriter:
+    """
+    Inserts the rows given to `add_all` into the table of `model`, every `flush_interval` seconds or as soon as
+    `batch_size` rows are buffered, with one multi-row INSERT. The thread starts on the first row, `stop` flushes
+    the rows still buffered (call it on shutdown).
+
+    The buffer holds at most `max_buffered` rows, the rows that do not fit are dropped and counted in `dropped`
+    so a database outage cannot exhaust the memory.
+    """
+
+    def __init__(self, model, batch_size: int, flush_interval: float, max_buffered: int):
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._rows: queue.Queue[dict] = queue.Queue(maxsize=max_buffered)
+        self._thread: threading.Thread | None = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def add_all(self, rows: Iterable[dict]) -> None:
+        self._ensure_started()
+        for row in rows:
+            try:
+                self._rows.put_nowait(row)
+            except queue.Full:
+                self.dropped += 1
+                print(f"{self.model.__tablename__} writer buffer full, row dropped ({self.dropped} so far)")
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stopping.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.model.__tablename__}-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set() or not self._rows.empty():
+            batch = []
+            try:
+                batch.append(self._rows.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self._rows.get_nowait())
+            except queue.Empty:
+                pass
+
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch) -> None:
+        try:
+            with SessionLocal() as db:
+                db.execute(insert(self.model), batch)
+                db.commit()
+        except Exception as e:
+            print(f"ERROR writing {len(batch)} rows to {self.model.__tablename__}: {e}")
+            traceback.print_exc()
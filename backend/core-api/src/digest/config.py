@@ -0,0 +1,9 @@
+from src.config import EnvFileLoader
+
+
+class DigestSetting(EnvFileLoader):
+    DIGEST_FLUSH_INTERVAL: float = 30.0  # Seconds between two checks of the worker for due digests
+    DIGEST_RETRY_SECONDS: int = 300  # Delay before retrying a digest whose delivery failed
+
+
+digest_setting = DigestSetting()
@@ -0,0 +1,29 @@
+from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import JSONB
+
+from src.database import Base
+
+
+# Event buffered for a digest reaction, the entries of a (user, action_name) are delivered together at flush_at
+class DigestEntry(Base):
+    __tablename__ = "digest_entry"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    task_id = Column(Integer, ForeignKey("task.id", ondelete="CASCADE"), nullable=False)
+    action_name = Column(String, nullable=False)  # "send_email" or "send_sms"
+    trigger = Column(String, nullable=False)
+    params = Column(JSONB, nullable=False, default=dict)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    flush_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_digest_entry_flush_at", "flush_at"),
+        Index("ix_digest_entry_user_id_action_name", "user_id", "action_name"),
+    )
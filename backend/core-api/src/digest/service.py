@@ -0,0 +1,104 @@
+import traceback
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.database import SessionLocal
+from src.digest.config import digest_setting
+from src.digest.models import DigestEntry
+from src.task.models import Task
+from src.task.utils import digest_registry
+from src.user.models import User
+
+
+def buffer_digest_entry(db: Session, task: Task, params: dict) -> None:
+    """
+    Buffers an event of a digest task instead of executing its reaction. The entry joins the pending digest
+    of the user for the same reaction, or starts a new one delivered in `task.digest_seconds`.
+
+    Args:
+        db (Session): The database session, the caller commits.
+        task (Task): The task in digest mode.
+        params (dict): The params of the event.
+    """
+    flush_at = (
+        db.query(func.min(DigestEntry.flush_at))
+        .filter(DigestEntry.user_id == task.user_id, DigestEntry.action_name == task.action_name)
+        .scalar()
+    )
+    if flush_at is None:
+        flush_at = datetime.now(timezone.utc) + timedelta(seconds=task.digest_seconds)
+
+    db.add(
+        DigestEntry(
+            user_id=task.user_id,
+            task_id=task.id,
+            action_name=task.action_name,
+            trigger=task.trigger,
+            params=params,
+            flush_at=flush_at,
+        )
+    )
+
+
+def flush_due_digests() -> int:
+    """
+    Delivers every digest whose interval is over with one LLM generation and one message, then removes its
+    entries. Each digest is claimed with SKIP LOCKED so several workers can flush at the same time: its entries
+    are postponed by `DIGEST_RETRY_SECONDS` and committed before the delivery, so no connection nor row lock is
+    held during the calls to the providers, and a digest whose delivery failed (or whose worker died) is
+    delivered again once that delay is over. A digest to an invalid address (`ValueError`) is dropped.
+
+    Returns:
+        int: The number of digests delivered.
+    """
+    delivered = 0
+
+    with SessionLocal(expire_on_commit=False) as db:
+        while True:
+            now = datetime.now(timezone.utc)
+            due_digest = (
+                db.query(DigestEntry.user_id, DigestEntry.action_name)
+                .filter(DigestEntry.flush_at <= now)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if due_digest is None:
+                db.commit()
+                break
+
+            user_id, action_name = due_digest
+            entries = (
+                db.query(DigestEntry)
+                .filter(DigestEntry.user_id == user_id, DigestEntry.action_name == action_name)
+                .order_by(DigestEntry.created_at)
+                .with_for_update()
+                .all()
+            )
+            user = db.get(User, user_id)
+            for entry in entries:
+                entry.flush_at = now + timedelta(seconds=digest_setting.DIGEST_RETRY_SECONDS)
+            db.commit()  # Releases the locks and the connection during the delivery
+
+            try:
+                digest_registry[action_name](user, entries)
+            except ValueError as e:
+                # Would fail again (invalid email address or phone number), the digest is dropped
+                print(f"ERROR '{action_name}' digest of user {user_id} is undeliverable, dropped: {e}")
+            except Exception as e:
+                print(f"ERROR delivering '{action_name}' digest of user {user_id}: {e}")
+                traceback.print_exc()
+                continue
+            else:
+                delivered += 1
+
+            db.query(DigestEntry).filter(DigestEntry.id.in_([entry.id for entry in entries])).delete(
+                synchronize_session=False
+            )
+            db.commit()
+
+    return delivered
@@ -0,0 +1,17 @@
+from src.config import EnvFileLoader
+
+
+class EventSetting(EnvFileLoader):
+    RECENT_MESSAGES_CACHE_SIZE: int = 100_000  # (user_id, message_id) pairs remembered in memory to drop redeliveries
+    # Admission control of `/events`, past these limits the events are refused with 429 + Retry-After
+    EVENT_MAX_IN_FLIGHT: int = 32  # Event requests handled at the same time, keep it below the threadpool size (40)
+    EVENT_MAX_QUEUED_JOBS: int = 10_000  # Reaction jobs pending or running
+    EVENT_QUEUED_JOBS_CACHE_SECONDS: float = 2.0  # How long the count of queued jobs is reused
+    EVENT_RETRY_AFTER_SECONDS: int = 2  # Value of the Retry-After header
+    EVENT_DRAIN_SECONDS: float = 10.0  # On shutdown, time given to the event requests in flight to finish
+    EVENT_DELIVERY_RETENTION_DAYS: int = 7  # Handled delivery ids are kept this long to drop the redeliveries
+    EVENT_DELIVERY_PURGE_SECONDS: int = 3600  # How often the reaction worker deletes the expired delivery ids
+    EVENT_REPLAY_RATE: float = 5.0  # Default number of replayed reactions scheduled per second
+
+
+event_setting = EventSetting()
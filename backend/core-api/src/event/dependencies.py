@@ -0,0 +1,20 @@
+from fastapi import HTTPException
+from fastapi import status
+
+from src.event.config import event_setting
+from src.event.utils import event_admission
+
+
+def admit_event():
+    """Refuses the event with 429 + Retry-After when core-api is overloaded, the sender retries it later."""
+    if not event_admission.try_enter():
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many events are being processed, retry later",
+            headers={"Retry-After": str(event_setting.EVENT_RETRY_AFTER_SECONDS)},
+        )
+
+    try:
+        yield
+    finally:
+        event_admission.leave()
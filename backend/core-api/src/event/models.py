@@ -1,8 +1,10 @@
+from sqlalchemy import BigInteger
 from sqlalchemy import Column
 from sqlalchemy import DateTime
 from sqlalchemy import Integer
 from sqlalchemy import String
 from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import JSONB
 
 from src.database import Base
 
@@ -14,3 +16,25 @@ class LastEvent(Base):
     trigger = Column(String, index=True)
     action_name = Column(String, index=True)
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+# Append-only log of the received events with their full payload, used to replay them (event/router.py).
+# The payload column is stored with lz4 TOAST compression (see its migration).
+class EventLog(Base):
+    __tablename__ = "event_log"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    event_name = Column(String, nullable=False)
+    service = Column(String, nullable=False)
+    event_hash = Column(String, nullable=False, index=True)
+    payload = Column(JSONB, nullable=False)  # params, context_params and processed_message_info
+    received_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+# Deliveries already handled (GitHub X-GitHub-Delivery...), inserted first in the transaction of the event so a
+# delivery received by several replicas at once is only handled by one (see event/utils.py:claim_deliveries)
+class EventDelivery(Base):
+    __tablename__ = "event_delivery"
+
+    delivery_id = Column(String, primary_key=True)
+    received_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
@@ -1,20 +1,25 @@
 from fastapi import APIRouter
+from fastapi import Depends
 from fastapi import HTTPException
 from sqlalchemy import desc
-from sqlalchemy.orm import Session
 from starlette import status
 
 from src.database import db_dependency
+from src.event.config import event_setting
+from src.event.dependencies import admit_event
 from src.event.models import LastEvent as LastEventModel
+from src.event.schemas import EventExplainResponse
 from src.event.schemas import EventPayload
+from src.event.schemas import EventReplayRequest
+from src.event.schemas import EventReplayResponse
 from src.event.schemas import LastEvent as LastEventSchema
-from src.event.utils import message_checker
+from src.event.service import explain_event
+from src.event.service import ingest_events
+from src.event.service import replay_events
+from src.event.utils import remember_processed_messages
 from src.task.models import ProcessedMessage as ProcessedMessageModel
-from src.task.models import Task
 from src.task.schemas import ProcessedMessage as ProcessedMessageSchema
-from src.task.service import execute_actions
-from src.task.utils import generate_event_hash
-from src.user.models import User
+from src.user.dependencies import current_admin_user_dependency
 
 router = APIRouter(prefix="/events", tags=["Events"])
 
@@ -23,9 +28,9 @@ router = APIRouter(prefix="/events", tags=["Events"])
 EVENT TRIGGER
 
 This endpoint `/event` (POST) is designed to inform the core API when an event has been triggered.
-The core API will then execute the actions associated with the event.
+The core API will then queue a reaction job for every task associated with the event and answer 202 right away,
+the reactions are executed by the reaction worker (`python -m src.job.worker`).
 The crucial part is that the event.params passed to the event are the same as `task.trigger_args`.
-This endpoint will execute any reactions associated with that specific event.
 
 EXAMPLE PAYLOAD:
 {
@@ -40,8 +45,16 @@ EXAMPLE PAYLOAD:
 `event_name` should match the trigger in the task model, and `params` should match the `trigger_args` in the task model.
 `service` is included to indicate the source of the event.
 
+When core-api is overloaded (too many events in flight or too many reaction jobs queued), the event is refused
+with a 429 and a `Retry-After` header, the microservices retry it after that delay.
+
+`/events/explain` runs the same matching on an event without any side effect and returns the matched tasks with
+the duration of each stage (testing trigger configurations, benchmarking the matcher).
+
+Every handled event is also appended to the `event_log` table with its full payload, `/events/replay` queues the
+reactions of the logged events again (backfills, reprocessing after an outage...).
+
 """
-special_triggers = ["email_received", "email_sent"]
 
 
 @router.get(
@@ -65,86 +78,59 @@ def get_events(db: db_dependency):
     status_code=status.HTTP_202_ACCEPTED,
     response_model=str,
     summary="Handle event",
-    description="Handles an event by executing the associated actions",
+    description="Handles an event by queueing a reaction job for every associated task, the jobs are executed by the reaction worker. Answers 429 with a Retry-After header when core-api is overloaded",
+    dependencies=[Depends(admit_event)],
 )
 def handle_event(db: db_dependency, event_request: EventPayload):
-    # print("MICROSERVICE EVENT RECEIVED ON CORE API")
-    # print(
-    # "event request", event_request
-    # )  # request has args and all of that but only name and args for creagin the hash
-    # print("event request", event_request)
-    # print("event_params", event_request.params)
-    # print("event_context_params", event_request.context_params)
-    # generate hash
-
-    if message_checker(db, event_request):
-        print("Message has been processed skiping the event...")
-        return ""
-
-    special_tasks = None
-    if event_request.event_name in special_triggers:
-        special_tasks = find_matching_tasks(
-            db,
-            event_request.event_name,
-            event_request.params.get("email"),
-            event_request.context_params.get("from"),
-            event_request.context_params.get("to"),
-        )
-    # generate task with that event
-    param_values_as_list = [str(value) for value in event_request.params.values()]  # event params as a list
-    event_hash = generate_event_hash(event_request.event_name, param_values_as_list)
-    merged_params = {**event_request.params, **event_request.context_params}
-    action_name = execute_actions(
-        db, special_tasks, event_request.event_name, event_request.service, event_hash, **merged_params
-    )
-    # print("action_name", action_name)
-    last_event = LastEventModel(
-        trigger=event_request.event_name,
-        action_name=action_name,
-    )
-    db.add(last_event)
-    # Create and log the ProcessedMessage to prevent reprocessing
-    if event_request.processed_message_info:
-        processed_message = ProcessedMessageModel(
-            message_id=event_request.processed_message_info.get("message_id"),
-            # Add any other fields necessary from ProcessedMessage
-            user_id=event_request.processed_message_info.get("user_id"),
-        )
-        db.add(processed_message)
-    # print("last event and processed message added to db")
+    # Jobs, last event, processed message and event log are committed together
+    action_names = ingest_events(db, [event_request])
     db.commit()
-    return "" if action_name is None else action_name
+    remember_processed_messages([event_request])
+    return action_names[0]
 
 
-def find_matching_tasks(db: Session, event_name: str, user_email: str, from_email: str, to_email: str):
-    tasks = (
-        db.query(Task)
-        .join(User)  # Join Task with User based on the relationship
-        .filter(Task.trigger == event_name)  # Filter by event name (trigger)
-        .filter(User.email == user_email)  # Filter by user email (params[0])
-        .all()
-    )
+@router.post(
+    "/batch",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=list[str],
+    summary="Handle a batch of events",
+    description="Handles a list of events in one transaction, returns the action name of each event in the same order. Answers 429 with a Retry-After header when core-api is overloaded",
+    dependencies=[Depends(admit_event)],
+)
+def handle_event_batch(db: db_dependency, event_requests: list[EventPayload]):
+    action_names = ingest_events(db, event_requests)
+    db.commit()
+    remember_processed_messages(event_requests)
+    return action_names
+
 
-    for task in tasks:
-        if len(task.trigger_args) >= 3:
-            if task.trigger_args[3] == "only_from":
-                if task.trigger_args[2] != from_email:
-                    print(f"Task {task.id} does not match the 'from' email")
-                    tasks.remove(task)
-                else:
-                    print("TASK MATCHES 'FROM' EMAIL")
-            elif task.trigger_args[3] == "only_to":
-                if task.trigger_args[2] != to_email:
-                    print(f"Task {task.id} does not match the 'to' email")
-                    tasks.remove(task)
-                else:
-                    print("TASK MATCHES 'TO' EMAIL")
-            else:
-                print("email_from not in trigger_args")
-        else:
-            print(f"Task {task.id} has insufficient trigger_args length")
-
-    return tasks
+@router.post(
+    "/explain",
+    status_code=status.HTTP_200_OK,
+    response_model=EventExplainResponse,
+    summary="Explain event",
+    description="Returns the tasks an event would trigger and why, with the duration of each matching stage, without queueing anything or claiming the message / delivery. Admin only",
+)
+def explain(db: db_dependency, admin_user: current_admin_user_dependency, event_request: EventPayload):
+    return explain_event(db, event_request)
+
+
+@router.post(
+    "/replay",
+    status_code=status.HTTP_200_OK,
+    response_model=EventReplayResponse,
+    summary="Replay logged events",
+    description="Queues again the reactions of the events received in a time range, for one task or all of them, spread at `rate` jobs per second. Admin only",
+)
+def replay_logged_events(
+    db: db_dependency, admin_user: current_admin_user_dependency, replay_request: EventReplayRequest
+):
+    rate = replay_request.rate or event_setting.EVENT_REPLAY_RATE
+    events, jobs = replay_events(
+        db, replay_request.start, replay_request.end, replay_request.task_id, replay_request.limit, rate
+    )
+    db.commit()
+    return EventReplayResponse(events=events, jobs=jobs)
 
 
 @router.get(
@@ -11,6 +11,7 @@ class EventPayload(BaseModel):
     params: Dict[str, str]
     context_params: Dict[str, str]
     processed_message_info: Dict[str, str] = None
+    delivery_id: str | None = None  # Id of the webhook delivery, a delivery is handled only once
 
     class Config:
         from_attributes = True
@@ -21,10 +22,59 @@ class EventPayload(BaseModel):
                 "params": {"repo": "my-repo", "branch": "main"},
                 "context_params": {"commit_msg": "Initial commit", "author": "pau"},
                 "processed_message_info": {"message_id": "1234", "user_id": "1"},
+                "delivery_id": "72d3162e-cc78-11e3-81ab-4c9367dc0958",
             }
         }
 
 
+class EventReplayRequest(BaseModel):
+    start: datetime
+    end: datetime
+    task_id: int | None = None  # None replays the reactions of every matched task
+    limit: int = Field(1000, ge=1, le=10_000)  # Maximum number of events, the oldest first
+    rate: float | None = Field(None, gt=0, le=100)  # Jobs per second, EVENT_REPLAY_RATE if not set
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "start": "2024-11-15T08:00:00Z",
+                "end": "2024-11-15T10:00:00Z",
+                "task_id": 1,
+                "limit": 1000,
+                "rate": 5,
+            }
+        }
+
+
+class EventReplayResponse(BaseModel):
+    events: int  # Replayed events
+    jobs: int  # Queued reaction jobs
+
+
+class ExplainedTask(BaseModel):
+    task_id: int
+    user_id: int
+    action_name: str
+    service: str
+    # How the task matched, once per way: "event_hash", "pattern" (trigger_args globs), "email_filter" (special
+    # email triggers). A task matched several ways is queued once by /events
+    matched_by: list[str]
+
+
+class StageTiming(BaseModel):
+    stage: str
+    duration_ms: float
+
+
+class EventExplainResponse(BaseModel):
+    event_hash: str
+    duplicate: bool  # The message or delivery was already handled, /events would skip the event
+    duplicate_reason: str | None = None
+    tasks: list[ExplainedTask]  # Tasks whose reaction /events would queue
+    stages: list[StageTiming]  # Duration of each matching stage, in order
+    total_ms: float
+
+
 class LastEvent(BaseModel):
     id: int
     trigger: str
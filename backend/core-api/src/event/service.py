@@ -0,0 +1,366 @@
+import time
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy import and_
+from sqlalchemy import column
+from sqlalchemy import insert
+from sqlalchemy import or_
+from sqlalchemy import values
+from sqlalchemy.orm import Session
+
+from src.event.config import event_setting
+from src.event.models import EventDelivery
+from src.event.models import EventLog
+from src.event.models import LastEvent
+from src.event.schemas import EventPayload
+from src.event.utils import claim_deliveries
+from src.event.utils import claim_messages
+from src.event.utils import get_message_key
+from src.event.utils import recent_messages
+from src.job.service import enqueue_reaction_jobs
+from src.task.index import TaskDescriptor
+from src.task.index import trigger_index
+from src.task.models import ProcessedMessage
+from src.task.models import Task
+from src.task.utils import generate_event_hash
+from src.user.models import User
+
+special_triggers = ["email_received", "email_sent"]
+
+
+def find_matching_tasks(db: Session, event_requests: list[EventPayload]) -> list[list[Task]]:
+    """
+    Returns, for each event, the email tasks of the user matching it. Only the special email triggers match,
+    the person filter (`only_from` / `only_to`) is evaluated by Postgres on the indexed `email_filter` and
+    `email_filter_address` columns, and all the events are resolved with a single query.
+
+    Args:
+        db (Session): The database session.
+        event_requests (list[EventPayload]): The received events.
+
+    Returns:
+        list[list[Task]]: The matching tasks of each event, in the same order as `event_requests`.
+    """
+    matched_tasks = [[] for _ in event_requests]
+
+    email_events_data = [
+        (
+            idx,
+            event_request.event_name,
+            event_request.params.get("email"),
+            event_request.context_params.get("from"),
+            event_request.context_params.get("to"),
+        )
+        for idx, event_request in enumerate(event_requests)
+        if event_request.event_name in special_triggers
+    ]
+    if not email_events_data:
+        return matched_tasks
+
+    email_events = values(
+        column("idx", Integer),
+        column("trigger", String),
+        column("email", String),
+        column("from_email", String),
+        column("to_email", String),
+        name="email_events",
+    ).data(email_events_data)
+
+    tasks = (
+        db.query(Task, email_events.c.idx)
+        .join(User)  # Join Task with User based on the relationship
+        .join(
+            email_events,
+            and_(
+                Task.trigger == email_events.c.trigger,  # Filter by event name (trigger)
+                User.email == email_events.c.email,  # Filter by user email (params[0])
+            ),
+        )
+        .filter(
+            or_(
+                Task.email_filter.is_(None),
+                and_(Task.email_filter == "only_from", Task.email_filter_address == email_events.c.from_email),
+                and_(Task.email_filter == "only_to", Task.email_filter_address == email_events.c.to_email),
+            )
+        )
+        .all()
+    )
+
+    for task, idx in tasks:
+        matched_tasks[idx].append(task)
+
+    return matched_tasks
+
+
+def get_event_hash(event_request: EventPayload) -> str:
+    param_values_as_list = [str(value) for value in event_request.params.values()]  # event params as a list
+    return generate_event_hash(event_request.event_name, param_values_as_list)
+
+
+def get_matching_tasks(
+    db: Session, event_requests: list[EventPayload], timings: dict[str, float] | None = None
+) -> list[tuple[str, list[Task | TaskDescriptor]]]:
+    """
+    Resolves the tasks subscribed to each event: the ones whose `event_hash` or trigger patterns match the event,
+    looked up in the in-memory trigger index, and, for the special email triggers, the ones matched by
+    `find_matching_tasks`. A task matched several ways is listed once per match, `enqueue_reaction_jobs` queues it
+    once.
+
+    Args:
+        db (Session): The database session.
+        event_requests (list[EventPayload]): The received events.
+        timings (dict[str, float], optional): Filled with the seconds spent in each matching stage, in order
+            (used by `explain_event`).
+
+    Returns:
+        list[tuple[str, list[Task | TaskDescriptor]]]: The event hash and the matched tasks of each event.
+    """
+    return [
+        (event_hash, [task for task, _ in tasks]) for event_hash, tasks in match_events(db, event_requests, timings)
+    ]
+
+
+def match_events(
+    db: Session, event_requests: list[EventPayload], timings: dict[str, float] | None = None
+) -> list[tuple[str, list[tuple[Task | TaskDescriptor, str]]]]:
+    """
+    Same as `get_matching_tasks` with how each task matched: "event_hash", "pattern" (glob trigger_args) or
+    "email_filter" (special email triggers).
+    """
+    clock = [time.perf_counter()]
+
+    def end_stage(stage: str):
+        if timings is not None:
+            now = time.perf_counter()
+            timings[stage] = timings.get(stage, 0.0) + now - clock[0]
+            clock[0] = now
+
+    special_tasks = find_matching_tasks(db, event_requests)
+    end_stage("email_filter")
+    trigger_index.ensure_fresh(db)
+    end_stage("index_refresh")
+
+    matches = []
+    for event_request, event_special_tasks in zip(event_requests, special_tasks):
+        event_hash = get_event_hash(event_request)
+        end_stage("hash")
+        tasks = [(task, "event_hash") for task in trigger_index.lookup(event_hash)]
+        end_stage("trigger_index")
+        # Pattern tasks match the param values in any order, like the hash, see `task/index.py:PatternTrie`
+        values = [str(value) for value in event_request.params.values()]
+        tasks.extend((task, "pattern") for task in trigger_index.match_patterns(event_request.event_name, values))
+        end_stage("pattern_trie")
+        tasks.extend((task, "email_filter") for task in event_special_tasks)
+        matches.append((event_hash, tasks))
+
+    return matches
+
+
+def ingest_events(db: Session, event_requests: list[EventPayload]) -> list[str]:
+    """
+    Queues the reactions of the events and records them (LastEvent, ProcessedMessage, EventDelivery, EventLog),
+    skipping the ones whose message or webhook delivery was already handled, by this replica or another one.
+    Everything is added to the session with bulk statements (one multi-row INSERT per table), the caller commits
+    so a batch of events is handled in one transaction, its event log included, and then calls
+    `remember_processed_messages`.
+
+    Args:
+        db (Session): The database session.
+        event_requests (list[EventPayload]): The received events.
+
+    Returns:
+        list[str]: For each event, the action name of its last matched task ("" if none or skipped).
+    """
+    message_keys = [get_message_key(event_request) for event_request in event_requests]
+    # Redeliveries of recently processed messages are dropped without a query
+    claimed_keys = claim_messages(
+        db, {key for key in message_keys if key is not None and key not in recent_messages}
+    )
+    claimed_deliveries = claim_deliveries(
+        db, {event_request.delivery_id for event_request in event_requests if event_request.delivery_id}
+    )
+
+    new_events = []
+    for event_request, message_key in zip(event_requests, message_keys):
+        if message_key is not None:
+            if message_key not in claimed_keys:
+                print("Message has been processed skiping the event...")
+                new_events.append(None)
+                continue
+            # Also skips duplicates inside the same batch
+            claimed_keys.discard(message_key)
+        if event_request.delivery_id:
+            if event_request.delivery_id not in claimed_deliveries:
+                print(f"Delivery {event_request.delivery_id} has already been handled, skipping the event...")
+                new_events.append(None)
+                continue
+            claimed_deliveries.discard(event_request.delivery_id)
+        new_events.append(event_request)
+
+    events_to_handle = [event_request for event_request in new_events if event_request is not None]
+    matches = iter(get_matching_tasks(db, events_to_handle))
+
+    received_at = datetime.now(timezone.utc)
+    action_names = []
+    matched_events = []
+    last_events = []
+    event_logs = []
+    for event_request in new_events:
+        if event_request is None:
+            action_names.append("")
+            continue
+
+        event_hash, tasks = next(matches)
+        matched_events.append((event_request, event_hash, tasks))
+        action_name = tasks[-1].action_name if tasks else None
+        action_names.append("" if action_name is None else action_name)
+        last_events.append(LastEvent(trigger=event_request.event_name, action_name=action_name))
+        event_logs.append(
+            {
+                "event_name": event_request.event_name,
+                "service": event_request.service,
+                "event_hash": event_hash,
+                "payload": {
+                    "params": event_request.params,
+                    "context_params": event_request.context_params,
+                    "processed_message_info": event_request.processed_message_info,
+                    "delivery_id": event_request.delivery_id,
+                },
+                "received_at": received_at,
+            }
+        )
+
+    # The reactions are executed by the worker (src/job/worker.py), not on this request
+    enqueue_reaction_jobs(db, matched_events)
+    db.add_all(last_events)
+    if event_logs:
+        # In the transaction of the events: an event whose jobs are committed is always in the log. A single event
+        # (`POST /events`) costs one more statement in its transaction, not a commit: buffering the log across
+        # requests (BatchWriter) would lose the events of a crash whose jobs are committed
+        db.execute(insert(EventLog), event_logs)
+
+    return action_names
+
+
+def explain_event(db: Session, event_request: EventPayload) -> dict:
+    """
+    Runs the matching path of `/events` (`match_events`) for one event without any side effect (no message or
+    delivery claimed, no job queued, nothing logged) and times each stage: dedupe, special email filters, index
+    refresh, hash, trigger index and pattern trie. A task matched several ways is listed once with every way it
+    matched, as `/events` queues a single job for it.
+
+    Args:
+        db (Session): The database session, only read.
+        event_request (EventPayload): The event to explain.
+
+    Returns:
+        Dict: See `event/schemas.py:EventExplainResponse`.
+    """
+    started = time.perf_counter()
+
+    duplicate_reason = None
+    message_key = get_message_key(event_request)
+    if message_key is not None:
+        user_id, message_id = message_key
+        if message_key in recent_messages or (
+            db.query(ProcessedMessage.id)
+            .filter(ProcessedMessage.user_id == user_id, ProcessedMessage.message_id == message_id)
+            .first()
+        ):
+            duplicate_reason = f"message {message_id} of user {user_id} already processed"
+    if (
+        duplicate_reason is None
+        and event_request.delivery_id
+        and db.get(EventDelivery, event_request.delivery_id) is not None
+    ):
+        duplicate_reason = f"delivery {event_request.delivery_id} already handled"
+    timings = {"dedupe": time.perf_counter() - started}
+
+    [(event_hash, matched)] = match_events(db, [event_request], timings)
+
+    tasks = {}
+    for task, matched_by in matched:
+        explained_task = tasks.setdefault(
+            task.id,
+            {
+                "task_id": task.id,
+                "user_id": task.user_id,
+                "action_name": task.action_name,
+                "service": task.service,
+                "matched_by": [],
+            },
+        )
+        if matched_by not in explained_task["matched_by"]:
+            explained_task["matched_by"].append(matched_by)
+
+    return {
+        "event_hash": event_hash,
+        "duplicate": duplicate_reason is not None,
+        "duplicate_reason": duplicate_reason,
+        "tasks": list(tasks.values()),
+        "stages": [{"stage": stage, "duration_ms": seconds * 1000} for stage, seconds in timings.items()],
+        "total_ms": (time.perf_counter() - started) * 1000,
+    }
+
+
+def replay_events(
+    db: Session, start: datetime, end: datetime, task_id: int | None, limit: int, rate: float
+) -> tuple[int, int]:
+    """
+    Queues again the reactions of the events logged between `start` and `end`, as if the events were received
+    now, without the webhooks being sent again. The caller commits.
+    The jobs are spread at `rate` jobs per second, so a replay does not burst the workers and the providers.
+
+    Args:
+        db (Session): The database session.
+        start (datetime): Replays the events received from this date (included).
+        end (datetime): Until this date (excluded).
+        task_id (int | None): Only replays the reactions of this task, None for every matched task.
+        limit (int): Maximum number of events replayed, the oldest first.
+        rate (float): Jobs scheduled per second.
+
+    Returns:
+        tuple[int, int]: The number of replayed events and of queued jobs.
+    """
+    event_logs = (
+        db.query(EventLog)
+        .filter(EventLog.received_at >= start, EventLog.received_at < end)
+        .order_by(EventLog.received_at, EventLog.id)
+        .limit(limit)
+        .all()
+    )
+    event_requests = [
+        EventPayload(event_name=event_log.event_name, service=event_log.service, **event_log.payload)
+        for event_log in event_logs
+    ]
+
+    matched_events = []
+    for event_request, (event_hash, tasks) in zip(event_requests, get_matching_tasks(db, event_requests)):
+        if task_id is not None:
+            tasks = [task for task in tasks if task.id == task_id]
+        if tasks:
+            matched_events.append((event_request, event_hash, tasks))
+
+    queued_jobs = enqueue_reaction_jobs(db, matched_events, rate=rate)
+    return len(event_logs), queued_jobs
+
+
+def purge_event_deliveries(db: Session) -> int:
+    """
+    Deletes the delivery ids handled more than `EVENT_DELIVERY_RETENTION_DAYS` ago, a redelivery older than that
+    would be handled again.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        int: The number of deleted delivery ids.
+    """
+    expired = datetime.now(timezone.utc) - timedelta(days=event_setting.EVENT_DELIVERY_RETENTION_DAYS)
+    deleted = db.query(EventDelivery).filter(EventDelivery.received_at < expired).delete(synchronize_session=False)
+    db.commit()
+    return deleted
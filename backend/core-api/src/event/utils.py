@@ -1,28 +1,196 @@
-from src.database import db_dependency
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from src.database import SessionLocal
+from src.event.config import event_setting
+from src.event.models import EventDelivery
 from src.event.schemas import EventPayload
+from src.job.service import count_queued_reaction_jobs
 from src.task.models import ProcessedMessage
 
 
-def message_checker(db: db_dependency, event_payload: EventPayload) -> bool:
+class RecentMessages:
+    """
+    Bounded LRU of recently processed (user_id, message_id) pairs. Redelivered Pub/Sub pushes are dropped
+    from memory, the `processed_messages` table stays the source of truth.
+    """
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._keys: OrderedDict[tuple[int, str], None] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: tuple[int, str]) -> bool:
+        with self._lock:
+            if key not in self._keys:
+                return False
+            self._keys.move_to_end(key)
+            return True
+
+    def add_all(self, keys: Iterable[tuple[int, str]]) -> None:
+        with self._lock:
+            for key in keys:
+                self._keys[key] = None
+                self._keys.move_to_end(key)
+            while len(self._keys) > self._max_size:
+                self._keys.popitem(last=False)
+
+
+recent_messages = RecentMessages(event_setting.RECENT_MESSAGES_CACHE_SIZE)
+
+
+class EventAdmission:
+    """
+    Admission control of the event endpoints. An event is refused when too many event requests are already
+    being handled, or when the reaction workers are behind (too many queued jobs), so a slow reaction
+    (OpenAI, SMTP...) cannot starve the threadpool shared with every other endpoint.
+
+    The in-flight counter is checked first, so a refused request never checks out a pooled connection. The count
+    of queued jobs is cached for `EVENT_QUEUED_JOBS_CACHE_SECONDS`, a single request opens a session to refresh it
+    when it is stale and the others use the previous count meanwhile.
+
+    On shutdown `close` refuses every new event, and `wait_idle` waits for the event requests in flight.
+    """
+
+    def __init__(self, max_in_flight: int, max_queued_jobs: int):
+        self._max_in_flight = max_in_flight
+        self._max_queued_jobs = max_queued_jobs
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queued_jobs = 0
+        self._counted_at: float | None = None
+        self._counting = False
+        self._closed = False
+        self._idle = threading.Condition(self._lock)
+
+    def try_enter(self) -> bool:
+        """Reserves a slot for an event request, returns False if the request must be refused."""
+        with self._lock:
+            if self._closed or self._in_flight >= self._max_in_flight:
+                return False
+            self._in_flight += 1
+
+        try:
+            admitted = self._queued_jobs_count() < self._max_queued_jobs
+        except Exception:
+            self.leave()
+            raise
+        if not admitted:
+            self.leave()
+        return admitted
+
+    def leave(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.notify_all()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Waits until no event request is in flight, returns False if some are still running after `timeout`."""
+        with self._lock:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout=timeout)
+
+    def _queued_jobs_count(self) -> int:
+        with self._lock:
+            now = time.monotonic()
+            stale = self._counted_at is None or now - self._counted_at > event_setting.EVENT_QUEUED_JOBS_CACHE_SECONDS
+            if not stale or self._counting:
+                return self._queued_jobs
+            self._counting = True
+
+        queued_jobs = None
+        try:
+            with SessionLocal() as db:
+                queued_jobs = count_queued_reaction_jobs(db)
+            return queued_jobs
+        finally:
+            with self._lock:
+                self._counting = False
+                if queued_jobs is not None:
+                    self._queued_jobs = queued_jobs
+                    self._counted_at = now
+
+
+event_admission = EventAdmission(event_setting.EVENT_MAX_IN_FLIGHT, event_setting.EVENT_MAX_QUEUED_JOBS)
+
+
+def get_message_key(event_payload: EventPayload) -> tuple[int, str] | None:
+    """
+    Returns the (user_id, message_id) identifying the message that produced the event, None if the event
+    does not come from a message (ex: github events).
+    """
     # Ensure processed_message_info exists and contains a message_id
     if not event_payload.processed_message_info or not event_payload.processed_message_info.get("message_id"):
-        return False  # No message to check, return False (safe default)
+        return None  # No message to check
 
     # Correctly get user_id from processed_message_info
     user_id = event_payload.processed_message_info.get("user_id")
-    if user_id is not None:
-        user_id = int(user_id)
-    else:
-        return False  # Cannot proceed without user_id
-
-    # Check if the message_id already exists for the user in the ProcessedMessage table
-    if (
-        db.query(ProcessedMessage)
-        .filter(
-            ProcessedMessage.message_id == event_payload.processed_message_info.get("message_id"),
-            ProcessedMessage.user_id == user_id,
-        )
-        .first()
-    ):
-        return True
-    return False
+    if user_id is None:
+        return None  # Cannot proceed without user_id
+
+    return int(user_id), event_payload.processed_message_info.get("message_id")
+
+
+def claim_messages(db: Session, keys: set[tuple[int, str]]) -> set[tuple[int, str]]:
+    """
+    Inserts the ProcessedMessage rows with `ON CONFLICT DO NOTHING` on (user_id, message_id) and returns the
+    pairs actually inserted. A concurrent delivery of the same message waits on the unique index until the
+    first transaction ends and then inserts nothing, so only one of them executes the reactions.
+
+    Args:
+        db (Session): The database session.
+        keys (set[tuple[int, str]]): The (user_id, message_id) pairs to claim.
+
+    Returns:
+        set[tuple[int, str]]: The claimed pairs, the others were already processed.
+    """
+    if not keys:
+        return set()
+
+    claimed = db.execute(
+        insert(ProcessedMessage)
+        .values([{"user_id": user_id, "message_id": message_id} for user_id, message_id in keys])
+        .on_conflict_do_nothing(index_elements=["user_id", "message_id"])
+        .returning(ProcessedMessage.user_id, ProcessedMessage.message_id)
+    )
+    return {(user_id, message_id) for user_id, message_id in claimed}
+
+
+def claim_deliveries(db: Session, delivery_ids: set[str]) -> set[str]:
+    """
+    Same as `claim_messages` for the webhook delivery ids: inserts the `event_delivery` rows with
+    `ON CONFLICT DO NOTHING` and returns the ids actually inserted. The same delivery received by two replicas
+    at once is serialized by the primary key, the second one inserts nothing once the first commits.
+
+    Args:
+        db (Session): The database session.
+        delivery_ids (set[str]): The delivery ids to claim.
+
+    Returns:
+        set[str]: The claimed ids, the others were already handled.
+    """
+    if not delivery_ids:
+        return set()
+
+    claimed = db.execute(
+        insert(EventDelivery)
+        # Sorted, so concurrent batches lock the ids in the same order and cannot deadlock
+        .values([{"delivery_id": delivery_id} for delivery_id in sorted(delivery_ids)])
+        .on_conflict_do_nothing(index_elements=["delivery_id"])
+        .returning(EventDelivery.delivery_id)
+    )
+    return set(claimed.scalars())
+
+
+def remember_processed_messages(event_payloads: list[EventPayload]) -> None:
+    """Adds the messages of the events to the in-memory LRU, call it once the events are committed."""
+    recent_messages.add_all(key for key in map(get_message_key, event_payloads) if key is not None)
@@ -0,0 +1,34 @@
+
+from src.config import EnvFileLoader
+
+
+class JobSetting(EnvFileLoader):
+    JOB_BATCH_SIZE: int = 20  # Jobs claimed per worker iteration
+    JOB_POLL_INTERVAL: float = 1.0  # Seconds the worker sleeps when the queue is empty
+    JOB_LEASE_SECONDS: int = 600  # A running job whose lease expired is considered abandoned and reclaimed
+    # Share of the reaction workers given to each `User.plan`, unknown plans get the weight of "free"
+    PLAN_WEIGHTS: dict[str, int] = {"free": 1, "personal": 4, "professional": 8}
+    JOB_METRICS_WINDOW_SECONDS: int = 300  # Claims taken into account for the wait-time metrics
+    # Failed reactions are retried with exponential backoff and jitter, then moved to `reaction_dead_letter`
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_SECONDS: float = 10.0  # Delay before the 2nd attempt, doubled on every attempt
+    JOB_RETRY_MAX_SECONDS: float = 3600.0
+    JOB_REPLAY_RATE: float = 5.0  # Replayed dead letters scheduled per second, so a replay does not burst providers
+    # Every reaction execution is recorded in `reaction_execution`, inserted in batches by a background thread
+    JOB_HISTORY_BATCH_SIZE: int = 500
+    JOB_HISTORY_FLUSH_SECONDS: float = 1.0
+    JOB_HISTORY_MAX_BUFFERED: int = 100_000
+
+
+job_setting = JobSetting()
+
+
+# Reaction job lifecycle
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+
+# Outcome of a reaction execution (reaction_execution.outcome)
+REACTION_SUCCESS = "success"
+REACTION_ERROR = "error"
+REACTION_TIMEOUT = "timeout"  # Abandoned after its deadline
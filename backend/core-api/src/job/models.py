@@ -0,0 +1,80 @@
+from sqlalchemy import BigInteger
+from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import Float
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+
+from src.database import Base
+from src.job.config import JOB_PENDING
+from src.task.models import Task
+
+
+# One row per (matched task, event), or per (user, event, reaction) for the grouped reactions. Inserted by `/events`
+# and consumed by the worker (src/job/worker.py)
+class ReactionJob(Base):
+    __tablename__ = "reaction_job"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    task_id = Column(Integer, ForeignKey("task.id", ondelete="CASCADE"), index=True, nullable=False)
+    task = relationship(Task)
+    # Every task of a grouped reaction (task/utils.py:grouped_reactions), `task_id` first. None for a single task
+    task_ids = Column(JSONB, nullable=True)
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), index=True, nullable=False)  # task.user_id
+    event_name = Column(String, nullable=False)
+    service = Column(String, nullable=False)
+    event_hash = Column(String, nullable=False)
+    params = Column(JSONB, nullable=False, default=dict)  # event.params + event.context_params
+    status = Column(String, nullable=False, default=JOB_PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    locked_by = Column(String, nullable=True)  # "<hostname>:<pid>" of the worker that claimed the job
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    run_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (Index("ix_reaction_job_status_run_at", "status", "run_at"),)
+
+
+# Job whose reaction failed `JOB_MAX_ATTEMPTS` times (or with a permanent error), replayable by an admin (job/router.py)
+class ReactionDeadLetter(Base):
+    __tablename__ = "reaction_dead_letter"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    job_id = Column(Integer, nullable=False)  # Id of the deleted reaction_job
+    task_id = Column(Integer, ForeignKey("task.id", ondelete="CASCADE"), index=True, nullable=False)
+    task_ids = Column(JSONB, nullable=True)
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), index=True, nullable=False)
+    event_name = Column(String, nullable=False)
+    service = Column(String, nullable=False)
+    event_hash = Column(String, nullable=False)
+    params = Column(JSONB, nullable=False, default=dict)
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)  # Creation of the job
+    failed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+# One row per reaction executed by the workers, written by `reaction_execution_writer` (job/utils.py).
+# No foreign keys: the history of a deleted task is kept for the latency stats.
+class ReactionExecution(Base):
+    __tablename__ = "reaction_execution"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    job_id = Column(Integer, nullable=False)
+    task_id = Column(Integer, index=True, nullable=False)
+    reaction_name = Column(String, nullable=False)  # task.action_name
+    service = Column(String, nullable=False)  # Service of the event
+    queue_wait_seconds = Column(Float, nullable=False)  # Between job.run_at and the start of the reaction
+    duration_seconds = Column(Float, nullable=False)
+    outcome = Column(String, nullable=False)  # REACTION_SUCCESS, REACTION_ERROR or REACTION_TIMEOUT
+    error_class = Column(String, nullable=True)  # Class name of the exception raised by the reaction
+    started_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (Index("ix_reaction_execution_reaction_name_started_at", "reaction_name", "started_at"),)
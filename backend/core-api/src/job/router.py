@@ -0,0 +1,81 @@
+
+from fastapi import APIRouter
+from fastapi import Query
+from starlette import status
+
+from src.database import db_dependency
+from src.job.models import ReactionDeadLetter as ReactionDeadLetterModel
+from src.job.schemas import DeadLetterReplayRequest
+from src.job.schemas import DeadLetterReplayResponse
+from src.job.schemas import PlanQueueMetrics
+from src.job.schemas import ReactionDeadLetter as ReactionDeadLetterSchema
+from src.job.schemas import ReactionLatencyStats
+from src.job.service import get_reaction_latency_stats
+from src.job.service import get_reaction_queue_metrics
+from src.job.service import replay_dead_letters
+from src.user.dependencies import current_admin_user_dependency
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.get(
+    "/metrics",
+    status_code=status.HTTP_200_OK,
+    response_model=list[PlanQueueMetrics],
+    summary="Get reaction queue metrics",
+    description="Returns per plan the depth of the reaction queue and the time waited by the jobs before being claimed by a worker. Admin only",
+)
+def get_queue_metrics(db: db_dependency, admin_user: current_admin_user_dependency):
+    return get_reaction_queue_metrics(db)
+
+
+@router.get(
+    "/reactions/latency",
+    status_code=status.HTTP_200_OK,
+    response_model=list[ReactionLatencyStats],
+    summary="Get reaction latency stats",
+    description="Returns per reaction the p50/p95/p99 execution time and the error and timeout counts over the window, split in buckets of bucket_seconds if given. Admin only",
+)
+def get_latency_stats(
+    db: db_dependency,
+    admin_user: current_admin_user_dependency,
+    window_seconds: int = Query(3600, ge=60, le=30 * 24 * 3600),
+    bucket_seconds: int | None = Query(None, ge=60),
+    reaction_name: str | None = Query(None),
+):
+    return get_reaction_latency_stats(db, window_seconds, bucket_seconds, reaction_name)
+
+
+@router.get(
+    "/dead_letters",
+    status_code=status.HTTP_200_OK,
+    response_model=list[ReactionDeadLetterSchema],
+    summary="Get dead letters",
+    description="Returns the reactions that failed on every attempt, oldest first. Admin only",
+)
+def get_dead_letters(
+    db: db_dependency,
+    admin_user: current_admin_user_dependency,
+    task_id: int | None = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    query = db.query(ReactionDeadLetterModel)
+    if task_id is not None:
+        query = query.filter(ReactionDeadLetterModel.task_id == task_id)
+
+    query = query.order_by(ReactionDeadLetterModel.failed_at, ReactionDeadLetterModel.id)
+    return query.offset(offset).limit(limit).all()
+
+
+@router.post(
+    "/dead_letters/replay",
+    status_code=status.HTTP_200_OK,
+    response_model=DeadLetterReplayResponse,
+    summary="Replay dead letters",
+    description="Queues the given dead letters again (or the oldest ones if no ids are given), spread over time at JOB_REPLAY_RATE jobs per second. Admin only",
+)
+def replay(db: db_dependency, admin_user: current_admin_user_dependency, replay_request: DeadLetterReplayRequest):
+    replayed = replay_dead_letters(db, replay_request.ids, replay_request.limit)
+    db.commit()
+    return DeadLetterReplayResponse(replayed=replayed)
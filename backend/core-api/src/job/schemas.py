@@ -0,0 +1,53 @@
+import datetime
+
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class PlanQueueMetrics(BaseModel):
+    plan: str
+    weight: int  # Share of the reaction workers given to the plan
+    queued: int  # Runnable jobs waiting for a worker
+    running: int
+    oldest_wait_seconds: float | None  # Wait of the oldest queued job
+    claimed: int  # Jobs claimed during the metrics window
+    avg_wait_seconds: float | None  # Wait between run_at and the claim, over the metrics window
+    p95_wait_seconds: float | None
+
+
+class ReactionLatencyStats(BaseModel):
+    reaction_name: str
+    window_start: datetime.datetime  # Start of the time bucket (or of the window)
+    executions: int
+    errors: int
+    timeouts: int  # Reactions abandoned after their deadline
+    avg_queue_wait_seconds: float  # Wait between run_at and the start of the reaction
+    p50_seconds: float  # Percentiles of the execution time
+    p95_seconds: float
+    p99_seconds: float
+
+
+class ReactionDeadLetter(BaseModel):
+    id: int
+    job_id: int
+    task_id: int
+    user_id: int
+    event_name: str
+    service: str
+    params: dict
+    attempts: int
+    last_error: str | None
+    created_at: datetime.datetime
+    failed_at: datetime.datetime
+
+    class Config:
+        from_attributes = True
+
+
+class DeadLetterReplayRequest(BaseModel):
+    ids: list[int] | None = None  # None replays the oldest dead letters
+    limit: int = Field(100, ge=1, le=1000)
+
+
+class DeadLetterReplayResponse(BaseModel):
+    replayed: int
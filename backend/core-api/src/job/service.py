@@ -0,0 +1,564 @@
+import random
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from sqlalchemy import Float
+from sqlalchemy import and_
+from sqlalchemy import case
+from sqlalchemy import cast
+from sqlalchemy import extract
+from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from src.event.schemas import EventPayload
+from src.job.config import JOB_DONE
+from src.job.config import JOB_PENDING
+from src.job.config import JOB_RUNNING
+from src.job.config import REACTION_ERROR
+from src.job.config import REACTION_TIMEOUT
+from src.job.config import job_setting
+from src.job.models import ReactionDeadLetter
+from src.job.models import ReactionExecution
+from src.job.models import ReactionJob
+from src.provider.exceptions import CircuitOpenError
+from src.provider.exceptions import RateLimitedError
+from src.task.exceptions import ReactionTimeoutError
+from src.task.index import TaskDescriptor
+from src.task.models import Task
+from src.task.utils import grouped_reactions
+from src.user.models import User
+
+
+def merge_event_params(params: dict, new_params: dict) -> dict:
+    """
+    Merges the params of an event into the params of a coalesced job: distinct values of the same key are
+    kept one per line, and `coalesced_events` counts the merged events.
+    """
+    merged = dict(params)
+    for key, value in new_params.items():
+        if key not in merged:
+            merged[key] = value
+        elif value not in merged[key].split("\n"):
+            merged[key] = f"{merged[key]}\n{value}"
+
+    merged["coalesced_events"] = str(int(params.get("coalesced_events", "1")) + 1)
+    return merged
+
+
+def enqueue_reaction_jobs(
+    db: Session,
+    matched_events: list[tuple[EventPayload, str, list[Task | TaskDescriptor]]],
+    rate: float | None = None,
+) -> int:
+    """
+    Inserts one pending job per matched task of every event. The caller commits, so the jobs are persisted in
+    the same transaction as the `LastEvent` and `ProcessedMessage` rows of the events.
+    A task deleted since it was matched (ex: stale trigger index) is skipped.
+
+    The tasks of the same user whose reaction messages them (`grouped_reactions`) get a single job per event and
+    reaction carrying all their ids (`ReactionJob.task_ids`): the user gets one email / SMS naming every task,
+    generated with a single LLM call, whatever batch or worker claims the job.
+
+    For tasks with a coalescing window (`Task.coalesce_seconds`) the job is delayed by the window, and the
+    events with the same event_hash received meanwhile are merged into it instead of creating new jobs.
+
+    Args:
+        db (Session): The database session.
+        matched_events (list[tuple[EventPayload, str, list[Task | TaskDescriptor]]]): The received events with
+            their hash and matched tasks.
+        rate (float, optional): Spreads the jobs at `rate` jobs per second instead of running them right away,
+            coalescing windows are ignored (used by the event replay).
+
+    Returns:
+        int: The number of new jobs (events merged into a coalescing job are not counted).
+    """
+    task_ids = {task.id for _, _, tasks in matched_events for task in tasks}
+    if not task_ids:
+        return 0
+
+    # Also reads the current owner, coalescing window and reaction of each task
+    task_rows = (
+        db.query(Task.id, Task.user_id, Task.coalesce_seconds, Task.action_name, Task.digest_seconds)
+        .filter(Task.id.in_(task_ids))
+        .all()
+    )
+    user_id_by_task = {row.id: row.user_id for row in task_rows}
+    coalesce_seconds_by_task = {row.id: row.coalesce_seconds for row in task_rows}
+    # The digest tasks are left out, the digest already merges their events
+    grouped_tasks = {row.id for row in task_rows if row.action_name in grouped_reactions and not row.digest_seconds}
+    action_by_task = {row.id: row.action_name for row in task_rows}
+
+    now = datetime.now(timezone.utc)
+    if rate is not None:
+        coalesce_seconds_by_task = dict.fromkeys(coalesce_seconds_by_task)
+
+    coalesced_keys = {
+        (task.id, event_hash)
+        for _, event_hash, tasks in matched_events
+        for task in tasks
+        if coalesce_seconds_by_task.get(task.id)
+    }
+    coalescing_jobs = {}
+    if coalesced_keys:
+        # The row locks below only cover the coalescing jobs that exist already: two events of the same task processed
+        # at once (other request or replica) would both insert one. A transaction advisory lock per (task, event_hash),
+        # taken in a fixed order, makes the second one wait for the commit of the first and merge into its job.
+        for task_id, event_hash in sorted(coalesced_keys):
+            db.execute(select(func.pg_advisory_xact_lock(task_id, func.hashtext(event_hash))))
+
+        # Jobs still inside their window, a job claimed meanwhile by a worker is no longer pending and is skipped
+        pending_jobs = (
+            db.query(ReactionJob)
+            .filter(
+                tuple_(ReactionJob.task_id, ReactionJob.event_hash).in_(coalesced_keys),
+                ReactionJob.status == JOB_PENDING,
+                ReactionJob.run_at > now,
+            )
+            .with_for_update()
+            .all()
+        )
+        coalescing_jobs = {(job.task_id, job.event_hash): job for job in pending_jobs}
+
+    jobs = []
+    new_coalescing_jobs = 0
+    for event_request, event_hash, tasks in matched_events:
+        merged_params = {**event_request.params, **event_request.context_params}
+        group_jobs = {}  # (user_id, action_name) -> job of the grouped reaction of this event
+        for task_id in dict.fromkeys(task.id for task in tasks):  # A task can match twice (hash and email filter)
+            if task_id not in coalesce_seconds_by_task:
+                continue
+
+            coalesce_seconds = coalesce_seconds_by_task[task_id]
+            if not coalesce_seconds:
+                group_key = (user_id_by_task[task_id], action_by_task[task_id])
+                if task_id in grouped_tasks and group_key in group_jobs:
+                    group_jobs[group_key]["task_ids"].append(task_id)
+                    continue
+
+                jobs.append(
+                    {
+                        "task_id": task_id,
+                        "user_id": user_id_by_task[task_id],
+                        "event_name": event_request.event_name,
+                        "service": event_request.service,
+                        "event_hash": event_hash,
+                        "params": merged_params,
+                        "status": JOB_PENDING,
+                        "attempts": 0,
+                        "task_ids": None,
+                    }
+                )
+                if task_id in grouped_tasks:
+                    group_jobs[group_key] = jobs[-1]
+                    jobs[-1]["task_ids"] = [task_id]
+                continue
+
+            coalescing_job = coalescing_jobs.get((task_id, event_hash))
+            if coalescing_job is not None:
+                coalescing_job.params = merge_event_params(coalescing_job.params, merged_params)
+                continue
+
+            coalescing_job = ReactionJob(
+                task_id=task_id,
+                user_id=user_id_by_task[task_id],
+                event_name=event_request.event_name,
+                service=event_request.service,
+                event_hash=event_hash,
+                params=merged_params,
+                status=JOB_PENDING,
+                attempts=0,
+                run_at=now + timedelta(seconds=coalesce_seconds),
+            )
+            db.add(coalescing_job)
+            coalescing_jobs[(task_id, event_hash)] = coalescing_job
+            new_coalescing_jobs += 1
+
+    for job in jobs:
+        if job["task_ids"] is not None and len(job["task_ids"]) == 1:
+            job["task_ids"] = None  # Nothing to group
+
+    if rate is not None:
+        for i, job in enumerate(jobs):
+            job["run_at"] = now + timedelta(seconds=i / rate)
+
+    if jobs:
+        db.execute(insert(ReactionJob), jobs)
+
+    return len(jobs) + new_coalescing_jobs
+
+
+def plan_weight():
+    """SQL expression of the weight of `User.plan`, see `JobSetting.PLAN_WEIGHTS`."""
+    default_weight = job_setting.PLAN_WEIGHTS.get("free", 1)
+    return case(job_setting.PLAN_WEIGHTS, value=User.plan, else_=default_weight)
+
+
+def claim_reaction_jobs(db: Session, worker_id: str, limit: int) -> list[ReactionJob]:
+    """
+    Claims up to `limit` runnable jobs with `SELECT ... FOR UPDATE SKIP LOCKED`, so concurrent workers
+    (processes or hosts) never claim the same job. Jobs left running by a dead worker are reclaimed
+    once their lease expires.
+
+    The jobs are claimed in weighted fair order across users: the n-th runnable job of a user gets the
+    virtual finish time n / weight of the user's plan, and the smallest virtual times are claimed first.
+    A user with hundreds of queued jobs only gets their share of the workers, the others are not delayed.
+
+    Args:
+        db (Session): The database session.
+        worker_id (str): Identifier of the claiming worker.
+        limit (int): Maximum number of jobs to claim.
+
+    Returns:
+        list[ReactionJob]: The claimed jobs in fair order, already committed as running.
+    """
+    now = datetime.now(timezone.utc)
+    lease_expired = now - timedelta(seconds=job_setting.JOB_LEASE_SECONDS)
+    runnable = or_(
+        and_(ReactionJob.status == JOB_PENDING, ReactionJob.run_at <= now),
+        and_(ReactionJob.status == JOB_RUNNING, ReactionJob.locked_at < lease_expired),
+    )
+
+    user_rank = func.row_number().over(
+        partition_by=ReactionJob.user_id, order_by=(ReactionJob.run_at, ReactionJob.id)
+    )
+    fair_order = (
+        db.query(ReactionJob.id.label("id"), (cast(user_rank, Float) / plan_weight()).label("virtual_finish"))
+        .join(User, User.id == ReactionJob.user_id)
+        .filter(runnable)
+        .subquery()
+    )
+
+    # `runnable` is checked again on the locked rows, a job claimed meanwhile by another worker is skipped
+    jobs = (
+        db.query(ReactionJob)
+        .join(fair_order, fair_order.c.id == ReactionJob.id)
+        .filter(runnable)
+        .order_by(fair_order.c.virtual_finish, ReactionJob.run_at, ReactionJob.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True, of=ReactionJob)
+        .all()
+    )
+
+    for job in jobs:
+        job.status = JOB_RUNNING
+        job.locked_by = worker_id
+        job.locked_at = now
+        job.attempts += 1
+
+    db.commit()
+    return jobs
+
+
+def release_reaction_jobs(db: Session, jobs: list[ReactionJob], worker_id: str) -> None:
+    """
+    Gives back claimed jobs whose reaction was not started (worker shutting down), they are runnable again
+    right away for the other workers instead of waiting for their lease to expire. The claim does not count
+    as an attempt.
+
+    Args:
+        db (Session): The database session.
+        jobs (list[ReactionJob]): The jobs to release.
+        worker_id (str): Identifier of the worker that claimed them, a job reclaimed since by another worker
+            is left alone.
+    """
+    if not jobs:
+        return
+
+    db.query(ReactionJob).filter(
+        ReactionJob.id.in_([job.id for job in jobs]),
+        ReactionJob.status == JOB_RUNNING,
+        ReactionJob.locked_by == worker_id,
+    ).update(
+        {
+            ReactionJob.status: JOB_PENDING,
+            ReactionJob.locked_by: None,
+            ReactionJob.locked_at: None,
+            ReactionJob.attempts: ReactionJob.attempts - 1,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def count_queued_reaction_jobs(db: Session) -> int:
+    """
+    Counts the reaction jobs not finished yet (pending or running), the backlog of the reaction workers.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        int: The number of queued jobs.
+    """
+    return (
+        db.query(func.count(ReactionJob.id)).filter(ReactionJob.status.in_([JOB_PENDING, JOB_RUNNING])).scalar()
+    )
+
+
+# Errors that another attempt would raise again (bad task params, unknown action...), dead-lettered right away.
+PERMANENT_ERRORS = (KeyError, TypeError, ValueError)
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """
+    A timed out reaction is abandoned, not cancelled: once its provider send has started it may still complete
+    (send the email, the USDC...), so it is not retried automatically either. A timeout before any side effect
+    (waiting for the rate limiter or the LLM) is retried like the other transient errors.
+    """
+    if isinstance(error, ReactionTimeoutError):
+        return error.send_started
+    return isinstance(error, PERMANENT_ERRORS)
+
+
+def get_retry_delay(attempts: int, error: Exception) -> float:
+    """
+    Exponential backoff with jitter: the n-th retry waits a random time between half and all of
+    `JOB_RETRY_BASE_SECONDS * 2^(n-1)`, capped at `JOB_RETRY_MAX_SECONDS`. A provider with an open circuit
+    is not retried before its next probe, nor a rate limited one before its tokens are available.
+    """
+    delay = min(job_setting.JOB_RETRY_MAX_SECONDS, job_setting.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    delay = random.uniform(delay / 2, delay)
+    if isinstance(error, (CircuitOpenError, RateLimitedError)):
+        delay = max(delay, error.retry_in)
+    return delay
+
+
+def finish_reaction_job(db: Session, job: ReactionJob, error: Exception | None = None) -> None:
+    """
+    Marks a claimed job as done. A failed job is scheduled again with backoff (see `get_retry_delay`),
+    or moved to the `reaction_dead_letter` table once it has used its `JOB_MAX_ATTEMPTS` attempts.
+
+    Args:
+        db (Session): The database session.
+        job (ReactionJob): The job to finish.
+        error (Exception, optional): The exception raised by the reaction, if any.
+    """
+    now = datetime.now(timezone.utc)
+
+    if error is None:
+        job.status = JOB_DONE
+        job.last_error = None
+        job.finished_at = now
+        db.commit()
+        return
+
+    job.last_error = f"{type(error).__name__}: {error}"
+    if job.attempts < job_setting.JOB_MAX_ATTEMPTS and not is_permanent_error(error):
+        delay = get_retry_delay(job.attempts, error)
+        print(f"Job {job.id} failed (attempt {job.attempts}), retrying in {delay:.0f}s")
+        job.status = JOB_PENDING
+        job.run_at = now + timedelta(seconds=delay)
+        job.locked_by = None
+        job.locked_at = None
+        db.commit()
+        return
+
+    print(f"Job {job.id} failed (attempt {job.attempts}), moved to the dead letters")
+    db.add(
+        ReactionDeadLetter(
+            job_id=job.id,
+            task_id=job.task_id,
+            task_ids=job.task_ids,
+            user_id=job.user_id,
+            event_name=job.event_name,
+            service=job.service,
+            event_hash=job.event_hash,
+            params=job.params,
+            attempts=job.attempts,
+            last_error=job.last_error,
+            created_at=job.created_at,
+        )
+    )
+    db.delete(job)
+    db.commit()
+
+
+def replay_dead_letters(db: Session, dead_letter_ids: list[int] | None, limit: int) -> int:
+    """
+    Queues the reactions of dead letters again as new jobs and removes the dead letters. The caller commits.
+    The jobs are spread over time at `JOB_REPLAY_RATE` jobs per second, so replaying a provider outage
+    does not send every reaction to the provider at once.
+
+    Args:
+        db (Session): The database session.
+        dead_letter_ids (list[int] | None): The dead letters to replay, None to replay the oldest ones.
+        limit (int): Maximum number of dead letters to replay.
+
+    Returns:
+        int: The number of replayed dead letters.
+    """
+    query = db.query(ReactionDeadLetter)
+    if dead_letter_ids is not None:
+        query = query.filter(ReactionDeadLetter.id.in_(dead_letter_ids))
+    dead_letters = (
+        query.order_by(ReactionDeadLetter.failed_at, ReactionDeadLetter.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not dead_letters:
+        return 0
+
+    now = datetime.now(timezone.utc)
+    jobs = [
+        {
+            "task_id": dead_letter.task_id,
+            "task_ids": dead_letter.task_ids,
+            "user_id": dead_letter.user_id,
+            "event_name": dead_letter.event_name,
+            "service": dead_letter.service,
+            "event_hash": dead_letter.event_hash,
+            "params": dead_letter.params,
+            "status": JOB_PENDING,
+            "attempts": 0,
+            "run_at": now + timedelta(seconds=i / job_setting.JOB_REPLAY_RATE),
+        }
+        for i, dead_letter in enumerate(dead_letters)
+    ]
+    db.execute(insert(ReactionJob), jobs)
+    db.query(ReactionDeadLetter).filter(
+        ReactionDeadLetter.id.in_([dead_letter.id for dead_letter in dead_letters])
+    ).delete(synchronize_session=False)
+
+    return len(dead_letters)
+
+
+def get_reaction_queue_metrics(db: Session) -> list[dict]:
+    """
+    Per-plan metrics of the reaction scheduler: depth of the queue and time waited by the jobs between
+    becoming runnable (`run_at`) and being claimed by a worker.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        list[dict]: One entry per plan, see `job/schemas.py:PlanQueueMetrics`.
+    """
+    now = datetime.now(timezone.utc)
+    window_start = now - timedelta(seconds=job_setting.JOB_METRICS_WINDOW_SECONDS)
+    plan = func.coalesce(User.plan, "free")
+    wait_seconds = extract("epoch", ReactionJob.locked_at - ReactionJob.run_at)
+
+    default_weight = job_setting.PLAN_WEIGHTS.get("free", 1)
+    metrics: dict[str, dict] = {}
+
+    def plan_metrics(name: str) -> dict:
+        if name not in metrics:
+            metrics[name] = {
+                "plan": name,
+                "weight": job_setting.PLAN_WEIGHTS.get(name, default_weight),
+                "queued": 0,
+                "running": 0,
+                "oldest_wait_seconds": None,
+                "claimed": 0,
+                "avg_wait_seconds": None,
+                "p95_wait_seconds": None,
+            }
+        return metrics[name]
+
+    for name in job_setting.PLAN_WEIGHTS:
+        plan_metrics(name)
+
+    depth_rows = (
+        db.query(plan, ReactionJob.status, func.count(ReactionJob.id), func.min(ReactionJob.run_at))
+        .join(User, User.id == ReactionJob.user_id)
+        .filter(
+            or_(
+                and_(ReactionJob.status == JOB_PENDING, ReactionJob.run_at <= now),
+                ReactionJob.status == JOB_RUNNING,
+            )
+        )
+        .group_by(plan, ReactionJob.status)
+        .all()
+    )
+    for name, job_status, count, oldest_run_at in depth_rows:
+        if job_status == JOB_PENDING:
+            plan_metrics(name)["queued"] = count
+            plan_metrics(name)["oldest_wait_seconds"] = (now - oldest_run_at).total_seconds()
+        else:
+            plan_metrics(name)["running"] = count
+
+    wait_rows = (
+        db.query(
+            plan,
+            func.count(ReactionJob.id),
+            func.avg(wait_seconds),
+            func.percentile_cont(0.95).within_group(wait_seconds),
+        )
+        .join(User, User.id == ReactionJob.user_id)
+        .filter(ReactionJob.locked_at >= window_start)
+        .group_by(plan)
+        .all()
+    )
+    for name, claimed, avg_wait, p95_wait in wait_rows:
+        plan_metrics(name)["claimed"] = claimed
+        plan_metrics(name)["avg_wait_seconds"] = float(avg_wait) if avg_wait is not None else None
+        plan_metrics(name)["p95_wait_seconds"] = float(p95_wait) if p95_wait is not None else None
+
+    return list(metrics.values())
+
+
+def get_reaction_latency_stats(
+    db: Session, window_seconds: int, bucket_seconds: int | None = None, reaction_name: str | None = None
+) -> list[dict]:
+    """
+    Latency percentiles of the reactions executed over the last `window_seconds`, from `reaction_execution`.
+
+    Args:
+        db (Session): The database session.
+        window_seconds (int): Executions started during this window are taken into account.
+        bucket_seconds (int, optional): Splits the window in buckets of this duration, one entry per reaction
+            and bucket. A single entry per reaction if missing.
+        reaction_name (str, optional): Only the executions of this reaction.
+
+    Returns:
+        list[dict]: See `job/schemas.py:ReactionLatencyStats`, ordered by reaction and bucket.
+    """
+    now = datetime.now(timezone.utc)
+    window_start = now - timedelta(seconds=window_seconds)
+    duration = ReactionExecution.duration_seconds
+
+    if bucket_seconds:
+        epoch = extract("epoch", ReactionExecution.started_at)
+        bucket_start = func.to_timestamp(func.floor(epoch / bucket_seconds) * bucket_seconds)
+        group_columns = [ReactionExecution.reaction_name, bucket_start]
+    else:
+        group_columns = [ReactionExecution.reaction_name]
+
+    query = db.query(
+        *group_columns,
+        func.count(ReactionExecution.id),
+        func.count(ReactionExecution.id).filter(ReactionExecution.outcome == REACTION_ERROR),
+        func.count(ReactionExecution.id).filter(ReactionExecution.outcome == REACTION_TIMEOUT),
+        func.avg(ReactionExecution.queue_wait_seconds),
+        func.percentile_cont(0.50).within_group(duration),
+        func.percentile_cont(0.95).within_group(duration),
+        func.percentile_cont(0.99).within_group(duration),
+    ).filter(ReactionExecution.started_at >= window_start)
+    if reaction_name is not None:
+        query = query.filter(ReactionExecution.reaction_name == reaction_name)
+
+    stats = []
+    for row in query.group_by(*group_columns).order_by(*group_columns):
+        if not bucket_seconds:
+            row = (row[0], window_start, *row[1:])
+        name, start, executions, errors, timeouts, avg_wait, p50, p95, p99 = row
+        stats.append(
+            {
+                "reaction_name": name,
+                "window_start": max(start, window_start),  # The first bucket starts before the window
+                "executions": executions,
+                "errors": errors,
+                "timeouts": timeouts,
+                "avg_queue_wait_seconds": float(avg_wait),
+                "p50_seconds": float(p50),
+                "p95_seconds": float(p95),
+                "p99_seconds": float(p99),
+            }
+        )
+    return stats
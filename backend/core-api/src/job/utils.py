@@ -0,0 +1,84 @@
+import threading
+import time
+from datetime import datetime
+
+from src.batch_writer import BatchWriter
+from src.job.config import REACTION_ERROR
+from src.job.config import REACTION_SUCCESS
+from src.job.config import REACTION_TIMEOUT
+from src.job.config import job_setting
+from src.job.models import ReactionExecution
+from src.job.models import ReactionJob
+from src.task.exceptions import ReactionTimeoutError
+
+
+class Shutdown(threading.Event):
+    """
+    Set by SIGTERM / SIGINT. The drain deadline is fixed when it is set, so the drain of the running reactions and
+    the one of the periodic tasks of the worker share a single budget of `drain_seconds`.
+    """
+
+    def __init__(self, drain_seconds: float):
+        super().__init__()
+        self.drain_seconds = drain_seconds
+        self.deadline: float | None = None  # time.monotonic()
+
+    def set(self) -> None:
+        if self.deadline is None:
+            self.deadline = time.monotonic() + self.drain_seconds
+        super().set()
+
+    def remaining(self) -> float:
+        """Seconds left to drain, the full budget while the worker is not stopping."""
+        if self.deadline is None:
+            return self.drain_seconds
+        return max(0.0, self.deadline - time.monotonic())
+
+
+reaction_execution_writer = BatchWriter(
+    ReactionExecution,
+    job_setting.JOB_HISTORY_BATCH_SIZE,
+    job_setting.JOB_HISTORY_FLUSH_SECONDS,
+    job_setting.JOB_HISTORY_MAX_BUFFERED,
+)
+
+
+def record_reaction_execution(
+    job: ReactionJob,
+    reaction_name: str,
+    started_at: datetime,
+    duration_seconds: float,
+    error: Exception | None = None,
+) -> None:
+    """
+    Buffers the `reaction_execution` row of an executed reaction, inserted later with the other rows of the batch.
+
+    Args:
+        job (ReactionJob): The executed job.
+        reaction_name (str): The action_name of the task.
+        started_at (datetime): Start of the reaction (timezone aware).
+        duration_seconds (float): Execution time of the reaction.
+        error (Exception, optional): The exception raised by the reaction, if any.
+    """
+    if error is None:
+        outcome = REACTION_SUCCESS
+    elif isinstance(error, ReactionTimeoutError):
+        outcome = REACTION_TIMEOUT
+    else:
+        outcome = REACTION_ERROR
+
+    reaction_execution_writer.add_all(
+        [
+            {
+                "job_id": job.id,
+                "task_id": job.task_id,
+                "reaction_name": reaction_name,
+                "service": job.service,
+                "queue_wait_seconds": max((started_at - job.run_at).total_seconds(), 0.0),
+                "duration_seconds": duration_seconds,
+                "outcome": outcome,
+                "error_class": type(error).__name__ if error is not None else None,
+                "started_at": started_at,
+            }
+        ]
+    )
@@ -0,0 +1,119 @@
+# Reaction worker entry point: `python -m src.job.worker`
+# Run as many workers as needed (processes or hosts), jobs are claimed with SKIP LOCKED.
+import asyncio
+import os
+import signal
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from socket import gethostname
+
+from src.database import SessionLocal
+from src.digest.config import digest_setting
+from src.digest.service import flush_due_digests
+from src.event.config import event_setting
+from src.event.service import purge_event_deliveries
+from src.job.config import job_setting
+from src.job.service import claim_reaction_jobs
+from src.job.service import release_reaction_jobs
+from src.job.utils import Shutdown
+from src.job.utils import reaction_execution_writer
+from src.provider.clients import close_http_clients
+from src.task.config import task_setting
+from src.task.service import execute_actions
+
+# Set by SIGTERM / SIGINT: the worker stops claiming jobs and drains the running reactions and periodic tasks, all
+# within REACTION_DRAIN_SECONDS of the signal
+stopping = Shutdown(task_setting.REACTION_DRAIN_SECONDS)
+
+
+def request_stop(signum, frame):
+    print(f"Received signal {signum}, draining the running reactions")
+    stopping.set()
+
+
+async def run_worker():
+    """
+    Claims and executes reaction jobs until SIGTERM / SIGINT. The reactions run on the event loop of the worker
+    (src/task/service.py:execute_actions), the blocking database calls on the default executor of the loop.
+    The digests and the purge of the delivery ids run as tasks of their own, so their provider calls do not
+    delay the claims.
+    """
+    worker_id = f"{gethostname()}:{os.getpid()}"
+    print(f"Reaction worker {worker_id} started")
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=task_setting.REACTION_DB_THREADS, thread_name_prefix="reaction-db")
+    )
+    digest_interval = digest_setting.DIGEST_FLUSH_INTERVAL
+    purge_interval = event_setting.EVENT_DELIVERY_PURGE_SECONDS
+    periodic_tasks = [
+        asyncio.create_task(run_periodically(worker_id, flush_due_digests, digest_interval, "delivered {} digests")),
+        asyncio.create_task(
+            run_periodically(worker_id, purge_deliveries, purge_interval, "purged {} expired delivery ids")
+        ),
+    ]
+
+    try:
+        while not stopping.is_set():
+            jobs = await asyncio.to_thread(claim_jobs, worker_id)
+            if jobs:
+                print(f"Worker {worker_id} claimed {len(jobs)} jobs")
+                not_started = await execute_actions(jobs, stopping)
+                if not_started:
+                    # Runnable again right away for the other workers
+                    await asyncio.to_thread(release_jobs, not_started, worker_id)
+                    print(f"Worker {worker_id} released {len(not_started)} jobs")
+            else:
+                await sleep_until_stopping(job_setting.JOB_POLL_INTERVAL)
+    finally:
+        # The running digest delivery (if any) finishes within what is left of the drain budget, its entries are
+        # retried later if it outlasts it
+        await asyncio.wait(periodic_tasks, timeout=stopping.remaining())
+        for periodic_task in periodic_tasks:
+            periodic_task.cancel()
+        await close_http_clients()
+        # Writes the reaction executions still buffered
+        reaction_execution_writer.stop()
+    print(f"Reaction worker {worker_id} stopped")
+
+
+async def run_periodically(worker_id: str, func, interval: float, message: str):
+    """Runs the blocking `func` every `interval` seconds until the worker stops, `message` logs a non-zero result."""
+    while not stopping.is_set():
+        try:
+            count = await asyncio.to_thread(func)
+            if count:
+                print(f"Worker {worker_id} {message.format(count)}")
+        except Exception as e:
+            print(f"ERROR in the '{func.__name__}' task of worker {worker_id}: {e}")
+            traceback.print_exc()
+        await sleep_until_stopping(interval)
+
+
+async def sleep_until_stopping(seconds: float):
+    """Sleeps `seconds`, or less if the worker is stopping, without holding a thread of the executor."""
+    deadline = time.monotonic() + seconds
+    while not stopping.is_set() and time.monotonic() < deadline:
+        await asyncio.sleep(min(1.0, deadline - time.monotonic()))
+
+
+def claim_jobs(worker_id: str):
+    # expire_on_commit=False keeps the claimed jobs readable without a refresh query per job
+    with SessionLocal(expire_on_commit=False) as db:
+        return claim_reaction_jobs(db, worker_id, job_setting.JOB_BATCH_SIZE)
+
+
+def purge_deliveries() -> int:
+    with SessionLocal() as db:
+        return purge_event_deliveries(db)
+
+
+def release_jobs(jobs, worker_id: str):
+    with SessionLocal() as db:
+        release_reaction_jobs(db, jobs, worker_id)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
@@ -6,5 +6,9 @@ class LlmSetting(EnvFileLoader):
     PROJECT_ID: str
     OPENAI_API_KEY: str
 
+    # Email / SMS contents generated once per event and personalized per recipient (llm/utils.py:event_contents)
+    LLM_CONTENT_CACHE_SECONDS: float = 600.0  # Lifetime of a generated content, covers the retries of the reactions
+    LLM_CONTENT_CACHE_MAX_ENTRIES: int = 1000  # Oldest contents evicted past this number
+
 
 llm_settings = LlmSetting()
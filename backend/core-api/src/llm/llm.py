@@ -1,9 +1,12 @@
 # This file is made for putting all the actions that can be executed by the tasks
 
 # email_utils.py
+import httpx
+from openai import AsyncOpenAI
 from openai import OpenAI
 
 from src.llm.config import llm_settings
+from src.provider.config import provider_setting
 
 
 def get_openai_client():
@@ -11,4 +14,16 @@ def get_openai_client():
         organization=llm_settings.ORGANIZATION_ID,
         project=llm_settings.PROJECT_ID,
         api_key=llm_settings.OPENAI_API_KEY,
+        timeout=provider_setting.PROVIDER_REQUEST_TIMEOUT_SECONDS,
+    )
+
+
+def get_async_openai_client(http_client: httpx.AsyncClient | None = None):
+    # For the async reactions, `http_client` lets them share the connection pool of src/provider/clients.py
+    return AsyncOpenAI(
+        organization=llm_settings.ORGANIZATION_ID,
+        project=llm_settings.PROJECT_ID,
+        api_key=llm_settings.OPENAI_API_KEY,
+        timeout=provider_setting.PROVIDER_REQUEST_TIMEOUT_SECONDS,
+        http_client=http_client,
     )
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Hashable
+
+from src.llm.config import llm_settings
+
+# Placeholders of the event-level contents, replaced per recipient by `personalize_content`
+FIRST_NAME_PLACEHOLDER = "{first_name}"
+USERNAME_PLACEHOLDER = "{username}"
+
+
+def get_event_content_key(reaction_name: str, trigger: str, params: dict) -> tuple:
+    """Key of the content generated for an event: the same for every recipient of the event."""
+    return reaction_name, trigger, json.dumps(params, sort_keys=True, default=str)
+
+
+def personalize_content(content: str, user) -> str:
+    """Fills the placeholders of an event-level content with the names of the recipient."""
+    return content.replace(FIRST_NAME_PLACEHOLDER, user.first_name or user.username).replace(
+        USERNAME_PLACEHOLDER, user.username
+    )
+
+
+class KeyLock:
+    """
+    Lock of a key of `EventContentCache` with the number of callers holding or waiting for it. It is only dropped
+    once nobody waits: a caller arriving after a failed generation queues behind the waiters instead of
+    generating at the same time.
+    """
+
+    __slots__ = ("lock", "waiters")
+
+    def __init__(self, lock):
+        self.lock = lock
+        self.waiters = 0
+
+
+class EventContentCache:
+    """
+    Contents generated by the LLM per event, so the N subscribers of an event cost one completion instead of N.
+    A content is generated once per key even when the reactions of the event ask for it at the same time, the
+    other callers wait for it (per key lock, see `KeyLock`): after a failed generation the next waiter tries again,
+    never two at the same time. Entries expire after `ttl` seconds and the oldest ones are evicted past
+    `max_entries`. Failed generations are not cached.
+
+    The blocking reactions (threads) use `get_or_generate`, the async ones (event loop of the worker)
+    `aget_or_generate`.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._contents: OrderedDict[Hashable, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict[Hashable, KeyLock] = {}  # Of threading.Lock
+        self._async_key_locks: dict[Hashable, KeyLock] = {}  # Of asyncio.Lock
+
+    def get(self, key: Hashable) -> str | None:
+        with self._lock:
+            entry = self._contents.get(key)
+            if entry is None:
+                return None
+            expires_at, content = entry
+            if expires_at <= time.monotonic():
+                del self._contents[key]
+                return None
+            return content
+
+    def set(self, key: Hashable, content: str) -> None:
+        with self._lock:
+            self._contents[key] = (time.monotonic() + self.ttl, content)
+            self._contents.move_to_end(key)
+            while len(self._contents) > self.max_entries:
+                self._contents.popitem(last=False)
+
+    def get_or_generate(self, key: Hashable, generate: Callable[[], str]) -> str:
+        content = self.get(key)
+        if content is not None:
+            return content
+        with self._lock:
+            key_lock = self._key_locks.get(key)
+            if key_lock is None:
+                key_lock = self._key_locks[key] = KeyLock(threading.Lock())
+            key_lock.waiters += 1
+        try:
+            with key_lock.lock:
+                content = self.get(key)  # Generated by another reaction meanwhile
+                if content is None:
+                    content = generate()
+                    self.set(key, content)
+                return content
+        finally:
+            with self._lock:
+                key_lock.waiters -= 1
+                if not key_lock.waiters:
+                    del self._key_locks[key]
+
+    async def aget_or_generate(self, key: Hashable, generate: Callable[[], Awaitable[str]]) -> str:
+        content = self.get(key)
+        if content is not None:
+            return content
+        # Only used from the event loop of the worker, no lock needed around the bookkeeping
+        key_lock = self._async_key_locks.get(key)
+        if key_lock is None:
+            key_lock = self._async_key_locks[key] = KeyLock(asyncio.Lock())
+        key_lock.waiters += 1
+        try:
+            async with key_lock.lock:
+                content = self.get(key)  # Generated by another reaction meanwhile
+                if content is None:
+                    content = await generate()
+                    self.set(key, content)
+                return content
+        finally:
+            key_lock.waiters -= 1
+            if not key_lock.waiters:
+                del self._async_key_locks[key]
+
+
+event_contents = EventContentCache(llm_settings.LLM_CONTENT_CACHE_SECONDS, llm_settings.LLM_CONTENT_CACHE_MAX_ENTRIES)
@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
 from socket import gethostbyname
 from socket import gethostname
@@ -10,21 +12,41 @@ from starlette.middleware.sessions import SessionMiddleware
 from src.auth.router import router as auth_router
 from src.auth.service import send_usdc
 from src.config import src_setting
+from src.database import SessionLocal
+from src.event.config import event_setting
 from src.event.router import router as events_router
+from src.event.utils import event_admission
+from src.job.router import router as jobs_router
 from src.schema import AboutJSON
 from src.schema import Action
 from src.schema import Client
 from src.schema import Reaction
 from src.schema import Server
 from src.schema import Service
+from src.task.index import trigger_index
 from src.task.router import router as task_router
 from src.user.router import router as user_router
 
-app = FastAPI(title="Core-API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the tasks into the trigger index before accepting events
+    with SessionLocal() as db:
+        trigger_index.build(db)
+    yield
+    # Drain: new events are refused with 429 (the microservices retry them on another replica or after the
+    # restart) and the events in flight get EVENT_DRAIN_SECONDS to be committed, their jobs are then in the queue
+    event_admission.close()
+    if not await asyncio.to_thread(event_admission.wait_idle, event_setting.EVENT_DRAIN_SECONDS):
+        print("Shutting down with event requests still in flight, their senders will retry them")
+
+
+app = FastAPI(title="Core-API", lifespan=lifespan)
 app.include_router(auth_router, prefix="/api/v1")
 app.include_router(user_router, prefix="/api/v1")
 app.include_router(events_router, prefix="/api/v1")
 app.include_router(task_router, prefix="/api/v1")
+app.include_router(jobs_router, prefix="/api/v1")
 
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,80 @@
+# Circuit breaker per external provider: after `PROVIDER_FAILURE_THRESHOLD` consecutive failures the calls to the
+# provider fail right away with CircuitOpenError for `PROVIDER_OPEN_SECONDS`, then a single probe call is let
+# through (half-open) and closes the circuit if it succeeds.
+import threading
+import time
+
+from src.provider.config import provider_setting
+from src.provider.exceptions import CircuitOpenError
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, open_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Raises CircuitOpenError if the provider must not be called now."""
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return
+
+            now = time.monotonic()
+            retry_in = self._opened_at + self.open_seconds - now
+            if retry_in <= 0:
+                # This call is the probe, another one is let through if it has not answered within open_seconds
+                self.state = CIRCUIT_HALF_OPEN
+                self._opened_at = now
+                print(f"Circuit of '{self.name}' half-open, probing the provider")
+                return
+
+            # Open, or half-open with the probe still running
+            raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CIRCUIT_CLOSED:
+                print(f"Circuit of '{self.name}' closed")
+            self.state = CIRCUIT_CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    print(f"Circuit of '{self.name}' opened after {self._failures} consecutive failures")
+                self.state = CIRCUIT_OPEN
+                self._opened_at = time.monotonic()
+
+
+class CircuitBreakers:
+    """Named circuit breakers, created on first use."""
+
+    def __init__(self):
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    provider,
+                    CircuitBreaker(
+                        provider, provider_setting.PROVIDER_FAILURE_THRESHOLD, provider_setting.PROVIDER_OPEN_SECONDS
+                    ),
+                )
+        return breaker
+
+
+circuit_breakers = CircuitBreakers()
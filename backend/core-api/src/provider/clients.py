@@ -0,0 +1,17 @@
+import httpx
+
+from src.llm.llm import get_async_openai_client
+from src.provider.config import provider_setting
+
+# HTTP client shared by the async reactions of the process (connection pooling, keep-alive). Bound to the event
+# loop of its first request, the reactions only run on the loop of the worker.
+http_client = httpx.AsyncClient(
+    timeout=provider_setting.PROVIDER_REQUEST_TIMEOUT_SECONDS,
+    limits=httpx.Limits(max_connections=provider_setting.PROVIDER_HTTP_MAX_CONNECTIONS),
+)
+async_ai_client = get_async_openai_client(http_client)
+
+
+async def close_http_clients() -> None:
+    """Closes the connections of the shared clients, call it before the event loop stops."""
+    await http_client.aclose()
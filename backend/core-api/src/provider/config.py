@@ -0,0 +1,25 @@
+
+from src.config import EnvFileLoader
+
+
+class ProviderSetting(EnvFileLoader):
+    # Outbound rate limit of each external provider: "rate" requests per second, bursts of up to "burst" requests.
+    # The buckets live in each process, divide the provider ceiling by the number of reaction worker processes.
+    PROVIDER_RATE_LIMITS: dict[str, dict[str, float]] = {
+        "openai": {"rate": 50.0, "burst": 50.0},  # 3500 RPM on gpt-3.5-turbo
+        "twilio": {"rate": 1.0, "burst": 5.0},  # 1 SMS per second on a long code number
+        "smtp": {"rate": 5.0, "burst": 10.0},
+        "reddit": {"rate": 1.5, "burst": 10.0},  # 100 requests per minute for an OAuth client
+        "google_calendar": {"rate": 10.0, "burst": 10.0},
+        "zksync_rpc": {"rate": 10.0, "burst": 20.0},
+    }
+    PROVIDER_DEFAULT_RATE_LIMIT: dict[str, float] = {"rate": 10.0, "burst": 10.0}  # Providers missing above
+    # Circuit breakers, see provider/circuit_breaker.py
+    PROVIDER_FAILURE_THRESHOLD: int = 5  # Consecutive failures that open the circuit of a provider
+    PROVIDER_OPEN_SECONDS: float = 30.0  # Time the circuit stays open before a probe call is let through
+    # Socket timeout of the provider clients (SMTP, zkSync RPC, OpenAI), keep it below the reaction timeouts
+    PROVIDER_REQUEST_TIMEOUT_SECONDS: float = 20.0
+    PROVIDER_HTTP_MAX_CONNECTIONS: int = 1000  # Connections of the HTTP client shared by the async reactions
+
+
+provider_setting = ProviderSetting()
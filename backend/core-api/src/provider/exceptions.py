@@ -0,0 +1,16 @@
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+    def __init__(self, provider: str, retry_in: float):
+        self.provider = provider
+        self.retry_in = retry_in
+        super().__init__(f"Provider '{provider}' is unavailable, next attempt in {retry_in:.0f}s")
+
+
+class RateLimitedError(Exception):
+    """Raised instead of waiting for the rate limiter of a provider past the deadline of the reaction."""
+
+    def __init__(self, provider: str, retry_in: float):
+        self.provider = provider
+        self.retry_in = retry_in
+        super().__init__(f"Rate limit of '{provider}' reached, next request possible in {retry_in:.0f}s")
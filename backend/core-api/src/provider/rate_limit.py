@@ -0,0 +1,117 @@
+# Outbound rate limiting of the reactions, one token bucket per external provider (see provider/config.py).
+# Usage: `rate_limiter.acquire("twilio")` before the call, or `await rate_limiter.acquire_async("twilio")`.
+import asyncio
+import threading
+import time
+from contextvars import ContextVar
+
+from src.provider.config import provider_setting
+from src.provider.exceptions import RateLimitedError
+
+# time.monotonic() deadline of the running reaction (set by task/service.py:execute_reaction_job), a reaction does
+# not wait for the rate limiter past it
+reaction_deadline: ContextVar[float | None] = ContextVar("reaction_deadline", default=None)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled with `rate` tokens per second up to `capacity`. A caller that finds the bucket empty
+    reserves its tokens anyway (the balance goes negative) and waits for them, so the waiting callers are
+    served in arrival order and the provider is called at its rate, never above. A caller that would wait past its
+    deadline takes nothing, and a cancelled waiter gives its tokens back, so the debt only covers real calls.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1, max_wait: float | None = None) -> float:
+        """
+        Takes `tokens` from the bucket.
+
+        Args:
+            tokens (float): The number of tokens (requests) to take.
+            max_wait (float, optional): Takes nothing and raises if the tokens are not available within this time.
+
+        Returns:
+            float: The seconds to wait before using them, 0 if they are available right away.
+
+        Raises:
+            RateLimitedError: If the wait would exceed `max_wait`.
+        """
+        with self._lock:
+            self._refill()
+            delay = 0.0 if self._tokens >= tokens else (tokens - self._tokens) / self.rate
+            if max_wait is not None and delay > max_wait:
+                raise RateLimitedError(self.name, delay)
+            self._tokens -= tokens
+            return delay
+
+    def refund(self, tokens: float = 1) -> None:
+        """Gives back the tokens of a reservation that was not used (waiter cancelled)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+
+class RateLimiter:
+    """Named token buckets, created on first use from `PROVIDER_RATE_LIMITS`."""
+
+    def __init__(self):
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, provider: str) -> TokenBucket:
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(provider)
+                if bucket is None:
+                    limit = provider_setting.PROVIDER_RATE_LIMITS.get(
+                        provider, provider_setting.PROVIDER_DEFAULT_RATE_LIMIT
+                    )
+                    bucket = TokenBucket(provider, limit["rate"], limit["burst"])
+                    self._buckets[provider] = bucket
+        return bucket
+
+    def acquire(self, provider: str, tokens: float = 1) -> None:
+        """
+        Blocks the calling thread until `tokens` requests can be sent to the provider.
+
+        Raises:
+            RateLimitedError: Right away, if the wait would outlast the deadline of the running reaction.
+        """
+        delay = self.bucket(provider).reserve(tokens, get_remaining_time())
+        if delay > 0:
+            print(f"Rate limit of '{provider}' reached, waiting {delay:.2f}s")
+            time.sleep(delay)
+
+    async def acquire_async(self, provider: str, tokens: float = 1) -> None:
+        """Same as `acquire` without blocking the event loop, the tokens are given back if the wait is cancelled."""
+        bucket = self.bucket(provider)
+        delay = bucket.reserve(tokens, get_remaining_time())
+        if delay > 0:
+            print(f"Rate limit of '{provider}' reached, waiting {delay:.2f}s")
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                bucket.refund(tokens)
+                raise
+
+
+def get_remaining_time() -> float | None:
+    """Seconds left before the deadline of the running reaction, None outside of a reaction."""
+    deadline = reaction_deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,122 @@
+import smtplib
+import threading
+from contextlib import asynccontextmanager
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import aiosmtplib
+import httpx
+import openai
+import prawcore
+
+from src.provider.circuit_breaker import circuit_breakers
+from src.provider.rate_limit import rate_limiter
+
+# Providers only read from (text generation): a reaction that timed out while calling them had no side effect
+READ_ONLY_PROVIDERS = {"openai"}
+
+# Set by task/service.py:execute_reaction_job, the event is set once the running reaction starts a call with side
+# effects (email, SMS, post, transaction...): a timeout after that point is not retried, see `ReactionTimeoutError`
+reaction_send_started: ContextVar[threading.Event | None] = ContextVar("reaction_send_started", default=None)
+
+
+def mark_send_started(provider: str, sends: bool) -> None:
+    send_started = reaction_send_started.get()
+    if send_started is not None and sends and provider not in READ_ONLY_PROVIDERS:
+        send_started.set()
+
+
+# Errors of the connection to a provider (refused, reset, DNS, timeout...), failures of the provider
+TRANSPORT_ERRORS = (OSError, httpx.TransportError, openai.APIConnectionError, prawcore.exceptions.RequestException)
+
+
+def get_status_code(error: Exception) -> int | None:
+    """
+    HTTP status of the response behind a provider error: `status_code` (openai), `status` (twilio),
+    `response.status_code` (httpx, praw) or `resp.status` (google). None if the error has no response.
+    """
+    response = getattr(error, "response", None) or getattr(error, "resp", None)
+    for status in (
+        getattr(error, "status_code", None),
+        getattr(error, "status", None),
+        getattr(response, "status_code", None),
+        getattr(response, "status", None),
+    ):
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """
+    Returns True if the error means the provider is unavailable: transport errors, timeouts, 5xx and 429 answers.
+    The errors caused by the request itself (4xx such as a bad phone number, a refused recipient, bad params) are
+    not failures of the provider, a few users with bad params must not open its circuit for everyone.
+    """
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, aiosmtplib.SMTPRecipientsRefused)):
+        return False
+    # 4xx replies are transient on SMTP, 5xx ones reject the message
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code < 500
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return error.code < 500
+    status_code = get_status_code(error)
+    if status_code is not None:
+        return status_code >= 500 or status_code == 429
+    return isinstance(error, TRANSPORT_ERRORS)
+
+
+@contextmanager
+def provider_call(provider: str, tokens: float = 1, sends: bool = True):
+    """
+    Wraps the calls of a reaction to an external provider: fails right away if the circuit breaker of the
+    provider is open, waits for the rate limiter, then records the outcome of the calls on the breaker. Only the
+    failures of the provider are counted (`is_provider_failure`), the client errors are raised again as is.
+
+    Args:
+        provider (str): The name of the provider, see `PROVIDER_RATE_LIMITS`.
+        tokens (float): The number of requests sent to the provider inside the block.
+        sends (bool): False for read-only requests (balance, nonce...) to a provider that is not read-only, they
+            do not mark the reaction as sent.
+
+    Raises:
+        CircuitOpenError: If the provider is considered down.
+        RateLimitedError: If the rate limiter would delay the call past the deadline of the reaction.
+
+    Example:
+        with provider_call("twilio"):
+            client.messages.create(...)
+    """
+    breaker = circuit_breakers.get(provider)
+    breaker.before_call()
+    rate_limiter.acquire(provider, tokens)  # Not a failure of the provider
+    mark_send_started(provider, sends)
+    try:
+        yield
+    except Exception as e:
+        if is_provider_failure(e):
+            breaker.record_failure()
+        raise
+    breaker.record_success()
+
+
+@asynccontextmanager
+async def async_provider_call(provider: str, tokens: float = 1, sends: bool = True):
+    """
+    Same as `provider_call` for the async reactions, waits for the rate limiter without blocking the event loop.
+
+    Example:
+        async with async_provider_call("twilio"):
+            await http_client.post(...)
+    """
+    breaker = circuit_breakers.get(provider)
+    breaker.before_call()
+    await rate_limiter.acquire_async(provider, tokens)  # Not a failure of the provider
+    mark_send_started(provider, sends)
+    try:
+        yield
+    except Exception as e:
+        if is_provider_failure(e):
+            breaker.record_failure()
+        raise
+    breaker.record_success()
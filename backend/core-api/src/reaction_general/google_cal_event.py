@@ -6,8 +6,8 @@ from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 
 from src.auth.config import auth_setting
+from src.provider.service import provider_call
 from src.task.schemas import CalendarReactionsArgs
-from src.user.models import User
 
 # # Event details -> needed example for calling this funciton
 # event_kwargs = {
@@ -86,10 +86,8 @@ def create_google_cal_event(task, db, **kwargs):
     """
     print("CREATE GOOGLE CAL EVENT HIT...")
 
-    # Extract user's Google token
-    # If not gettit from the task user... (bether get the actual one) I guess...
-    user = db.query(User).get(task.user_id)
-    google_token = user.token.google_token
+    # Extract user's Google token, loaded with the task (task/service.py:load_reaction_tasks)
+    google_token = task.user.token.google_token
 
     if not google_token:
         return "User has not authenticated with Google or token expired."
@@ -112,7 +110,8 @@ def create_google_cal_event(task, db, **kwargs):
             # Update the stored tokens
             google_token.access_token = credentials.token
             google_token.expires_at = int(credentials.expiry.timestamp())
-            db.add(google_token)
+            # The task is shared by the reactions of the batch, the session gets its own copy of the token
+            db.merge(google_token)
             db.commit()
         except Exception as e:
             return f"Failed to refresh Google token: {str(e)}"
@@ -175,7 +174,8 @@ def create_google_cal_event(task, db, **kwargs):
         # Build the service
         service = build("calendar", "v3", credentials=credentials)
         # Insert the event
-        event_result = service.events().insert(calendarId="primary", body=event_details).execute()
+        with provider_call("google_calendar"):
+            event_result = service.events().insert(calendarId="primary", body=event_details).execute()
 
         # Log and return event creation success
         print(f"Google Calendar event created: {event_result.get('htmlLink')}")
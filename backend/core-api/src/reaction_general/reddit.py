@@ -4,6 +4,7 @@ import praw
 
 from src.config import EnvFileLoader
 from src.llm.llm import get_openai_client
+from src.provider.service import provider_call
 
 
 class RedditSetting(EnvFileLoader):
@@ -45,9 +46,10 @@ def generate_body(prompt: str) -> str:
     Returns:
         str: The generated response body.
     """
-    completion = aiClient.chat.completions.create(
-        model="gpt-3.5-turbo", messages=[{"role": "system", "content": prompt}]
-    )
+    with provider_call("openai"):
+        completion = aiClient.chat.completions.create(
+            model="gpt-3.5-turbo", messages=[{"role": "system", "content": prompt}]
+        )
 
     body = completion.choices[0].message.content
     return body
@@ -92,9 +94,12 @@ def send_private_message(task=None, db=None, **kwargs):
 
     print(f"Sending private message to {username} with message: {message}")
     try:
-        reddit.redditor(username).message(subject="Automated Area message", message=message)
+        with provider_call("reddit"):
+            reddit.redditor(username).message(subject="Automated Area message", message=message)
     except Exception as e:
+        # Raised again so the job is retried (or dead-lettered) and the circuit breaker sees it
         print(e)
+        raise
 
 
 def post_new_submission(task=None, db=None, **kwargs) -> str:
@@ -148,11 +153,13 @@ def post_new_submission(task=None, db=None, **kwargs) -> str:
 
     print(f"Posting new submission to {subreddit} with title: {title} and content: {post_content}")
     try:
-        submision = reddit.subreddit(subreddit).submit(title, selftext=post_content)
+        with provider_call("reddit"):
+            submision = reddit.subreddit(subreddit).submit(title, selftext=post_content)
         return str(submision)
     except Exception as e:
+        # Raised again so the job is retried (or dead-lettered) and the circuit breaker sees it
         print(e)
-        return ""
+        raise
 
 
 def post_new_comment_on_post(task=None, db=None, **kwargs):
@@ -199,7 +206,10 @@ def post_new_comment_on_post(task=None, db=None, **kwargs):
 
     print(f"Posting new comment on post {post_id} with content: {comment}")
     try:
-        ret = reddit.submission(id=post_id).reply(comment)
+        with provider_call("reddit", tokens=2):  # Fetches the submission, then posts the reply
+            ret = reddit.submission(id=post_id).reply(comment)
         print(f"Comment posted successfully: {ret}")
     except Exception as e:
+        # Raised again so the job is retried (or dead-lettered) and the circuit breaker sees it
         print(e)
+        raise
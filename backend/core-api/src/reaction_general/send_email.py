@@ -3,11 +3,21 @@
 import smtplib
 from email.message import EmailMessage
 
+import aiosmtplib
 from email_validator import EmailNotValidError
 from email_validator import validate_email
 
 from src.config import EnvFileLoader
 from src.llm.llm import get_openai_client
+from src.llm.utils import FIRST_NAME_PLACEHOLDER
+from src.llm.utils import event_contents
+from src.llm.utils import get_event_content_key
+from src.llm.utils import personalize_content
+from src.provider.clients import async_ai_client
+from src.provider.config import provider_setting
+from src.provider.service import async_provider_call
+from src.provider.service import provider_call
+from src.reaction_general.utils import describe_triggering_tasks
 
 
 # SMTP configuration
@@ -21,43 +31,84 @@ class ReactionGeneralSetting(EnvFileLoader):
 
 reaction_general_setting = ReactionGeneralSetting()
 
+# Added after the generated body of the event emails, so the triggering tasks are listed before it
+EMAIL_SIGNATURE = "Best regards,\nOperations team\nArea-Epitech"
+
 aiClient = get_openai_client()
 
 
-def generate_email_content(task, db=None, **kwargs):
+async def generate_event_email_content(trigger, **kwargs):
     # Dynamically build the context string based on the provided kwargs
     event_details = ", ".join([f"{key}: '{value}'" for key, value in kwargs.items()])
 
     print("event_details on send_email reaction", event_details)
 
-    # Construct the notification message
+    # Construct the notification message, nothing specific to the recipient: the content is shared by all of them
     context = (
-        f"User '{task.user.username}' triggered the event '{task.trigger}'"
+        f"The event '{trigger}' occurred"
         f"{' with the following details: ' + event_details if event_details else '.'}"
     )
 
     # Refined prompt for email generation
     prompt = (
-        f"Compose a brief and professional email to notify the user that an event has occurred. Explicitly mention to whom the email is addressed and who the sender is. Try to understand from what service does the event comfe from, we have google and github at the moment and addapt the response to it\n\n"
+        f"Compose the body of a brief and professional email to notify the user that an event has occurred. Try to understand from what service does the event comfe from, we have google and github at the moment and addapt the response to it\n\n"
         f"Do it as close as a human text as possible try to understand the event and explain it brieflly to the user, do not use a schematic whay to response or bulletpoints, redact a coherent text. The sender name is Operations team and the enterpise is Area-Epitech \n\n"
-        f"Event Details:\n{context}\n\nEmail:\n\nDear {task.user.first_name},"
+        f"Write only the body: no greeting and no signature, they are added around it for each recipient\n\n"
+        f"Event Details:\n{context}\n\nEmail body:"
     )
 
-    completion = aiClient.chat.completions.create(
-        model="gpt-3.5-turbo", messages=[{"role": "system", "content": prompt}]
+    async with async_provider_call("openai"):
+        completion = await async_ai_client.chat.completions.create(
+            model="gpt-3.5-turbo", messages=[{"role": "system", "content": prompt}]
+        )
+
+    email_content = completion.choices[0].message.content
+    return email_content
+
+
+async def generate_email_content(task, db=None, tasks=None, **kwargs):
+    # Generated once per event (llm/utils.py:event_contents), then personalized for the user of the task
+    key = get_event_content_key("send_email", task.trigger, kwargs)
+    email_body = await event_contents.aget_or_generate(
+        key, lambda: generate_event_email_content(task.trigger, **kwargs)
+    )
+    email_content = (
+        f"Dear {FIRST_NAME_PLACEHOLDER},\n\n{email_body.strip()}{describe_triggering_tasks(tasks or [task])}\n\n"
+        f"{EMAIL_SIGNATURE}"
     )
+    return personalize_content(email_content, task.user)
+
+
+def generate_digest_email_content(user, entries):
+    # One line per buffered event, the digest is generated with a single LLM call
+    events_details = []
+    for entry in entries:
+        details = ", ".join([f"{key}: '{value}'" for key, value in entry.params.items()])
+        events_details.append(f"- Event '{entry.trigger}'{' with the following details: ' + details if details else ''}")
+    events_details = "\n".join(events_details)
+
+    prompt = (
+        f"Compose a brief and professional email summarizing the {len(entries)} events that occurred since the last notification. Explicitly mention to whom the email is addressed and who the sender is. Try to understand from what service does each event come from, we have google and github at the moment and addapt the response to it\n\n"
+        f"Do it as close as a human text as possible, group similar events and explain them brieflly to the user, redact a coherent text. The sender name is Operations team and the enterpise is Area-Epitech \n\n"
+        f"Events of user '{user.username}':\n{events_details}\n\nEmail:\n\nDear {user.first_name},"
+    )
+
+    with provider_call("openai"):
+        completion = aiClient.chat.completions.create(
+            model="gpt-3.5-turbo", messages=[{"role": "system", "content": prompt}]
+        )
 
     email_content = completion.choices[0].message.content
     return email_content
 
 
-def send_email_via_smtp(recipient_email, email_content):
+def build_email_message(recipient_email, email_content) -> EmailMessage:
     try:
         valid = validate_email(recipient_email)
         recipient_email = valid.email
     except EmailNotValidError as e:
         print(f"Invalid email address: {e}")
-        return
+        raise ValueError(f"Invalid email address: {e}") from e
 
     print("Sender email: ", reaction_general_setting.SMTP_FROM)
 
@@ -66,9 +117,22 @@ def send_email_via_smtp(recipient_email, email_content):
     msg["From"] = reaction_general_setting.SMTP_FROM  # Use a valid "From" email
     msg["To"] = recipient_email
     msg.set_content(email_content)
+    return msg
+
+
+def send_email_via_smtp(recipient_email, email_content):
+    msg = build_email_message(recipient_email, email_content)
+    recipient_email = msg["To"]
 
     try:
-        with smtplib.SMTP(reaction_general_setting.SMTP_SERVER, reaction_general_setting.SMTP_PORT) as server:
+        with (
+            provider_call("smtp"),
+            smtplib.SMTP(
+                reaction_general_setting.SMTP_SERVER,
+                reaction_general_setting.SMTP_PORT,
+                timeout=provider_setting.PROVIDER_REQUEST_TIMEOUT_SECONDS,
+            ) as server,
+        ):
             server.starttls()
             server.login(
                 reaction_general_setting.SMTP_USERNAME,
@@ -77,14 +141,49 @@ def send_email_via_smtp(recipient_email, email_content):
             server.send_message(msg)
             print(f"Email successfully sent to {recipient_email}")
     except Exception as e:
+        # Raised again so the job is retried (or dead-lettered) and the circuit breaker sees it
+        print(f"Failed to send email: {e}")
+        raise
+
+
+async def send_email_via_smtp_async(recipient_email, email_content):
+    # Same as send_email_via_smtp with aiosmtplib, the connection does not block the event loop of the worker
+    msg = build_email_message(recipient_email, email_content)
+    recipient_email = msg["To"]
+
+    try:
+        async with async_provider_call("smtp"):
+            await aiosmtplib.send(
+                msg,
+                hostname=reaction_general_setting.SMTP_SERVER,
+                port=reaction_general_setting.SMTP_PORT,
+                username=reaction_general_setting.SMTP_USERNAME,
+                password=reaction_general_setting.SMTP_PASSWORD,
+                start_tls=True,
+                timeout=provider_setting.PROVIDER_REQUEST_TIMEOUT_SECONDS,
+            )
+        print(f"Email successfully sent to {recipient_email}")
+    except Exception as e:
+        # Raised again so the job is retried (or dead-lettered) and the circuit breaker sees it
         print(f"Failed to send email: {e}")
+        raise
 
 
-def send_email(service_from=None, task=None, **kwargs):
+# Async reaction: runs on the event loop of the worker, it gets no database session (db is None)
+# `tasks`: every task of the user triggering this email when grouped, see task/utils.py:grouped_reactions
+async def send_email(service_from=None, task=None, db=None, tasks=None, **kwargs):
     print("Email function hit....")
-    email_content = generate_email_content(task, **kwargs)
+    email_content = await generate_email_content(task, db, tasks=tasks, **kwargs)
     print("After email content")
     recipient_email = task.user.email
-    send_email_via_smtp(recipient_email, email_content)
+    await send_email_via_smtp_async(recipient_email, email_content)
     print(f"Email sent to {recipient_email} with content:\n{email_content}")
     return f"Email sent to {recipient_email}"
+
+
+def send_email_digest(user, entries):
+    print(f"Email digest of {len(entries)} events hit....")
+    email_content = generate_digest_email_content(user, entries)
+    send_email_via_smtp(user.email, email_content)
+    print(f"Digest email sent to {user.email} with content:\n{email_content}")
+    return f"Digest email sent to {user.email}"
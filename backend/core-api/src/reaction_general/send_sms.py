@@ -2,6 +2,15 @@ from twilio.rest import Client
 
 from src.config import EnvFileLoader
 from src.llm.llm import get_openai_client
+from src.llm.utils import FIRST_NAME_PLACEHOLDER
+from src.llm.utils import event_contents
+from src.llm.utils import get_event_content_key
+from src.llm.utils import personalize_content
+from src.provider.clients import async_ai_client
+from src.provider.clients import http_client
+from src.provider.service import async_provider_call
+from src.provider.service import provider_call
+from src.reaction_general.utils import describe_triggering_tasks
 
 
 # Twilio configuration class (you can adapt this to load from your environment)
@@ -13,38 +22,74 @@ class SMSGeneralSetting(EnvFileLoader):
 
 sms_general_setting = SMSGeneralSetting()
 
+# Added after the generated body of the event SMS, so the triggering tasks are listed before it
+SMS_SIGNATURE = "Area-Team"
+
 # Loading the LLM model
 aiClient = get_openai_client()
 
 
-def generate_sms_content(task, db=None, **kwargs):
+async def generate_event_sms_content(trigger, **kwargs):
     # Dynamically build the context string based on the provided kwargs
     event_details = ", ".join([f"{key}: '{value}'" for key, value in kwargs.items()])
 
-    # Construct the event notification message
-    context = (
-        f"User {task.user.username} has triggered the event '{task.trigger}'"
-        f"{' with details: ' + event_details if event_details else '.'}"
-    )
+    # Construct the event notification message, nothing specific to the recipient: the content is shared by all of them
+    context = f"The event '{trigger}' occurred{' with details: ' + event_details if event_details else '.'}"
 
     # Updated prompt to clearly indicate short SMS format
     prompt = (
-        f"Compose a brief SMS to notify the user that an event has occurred. Explicitly mention to whom the SMS is addressed and who the sender is. Try to understand from what service does the event comfe from, we have google and github at the moment and addapt the response to it\n\n"
+        f"Compose the body of a brief SMS to notify the user that an event has occurred. Try to understand from what service does the event comfe from, we have google and github at the moment and addapt the response to it\n\n"
         f"No calls to action are needed, just notify the user about the event details. The message sender name is Area-Team\n\n"
         f"Do not start by telling you have triggered x event, since the event can be trigger by more people he only has a listener pointing to that event\n\n"
         f"Format the message so it's complince with message (SMS) applications so the new lines and point lists, so the user has a good visualization\n\n"
-        f"Event Details:\n{context}\n\SMS:\n\nDear {task.user.first_name},"
+        f"Write only the body: no greeting and no signature, they are added around it for each recipient\n\n"
+        f"Event Details:\n{context}\n\nSMS body:"
     )
 
     # Encode the prompt
-    completion = aiClient.chat.completions.create(
-        model="gpt-3.5-turbo", messages=[{"role": "system", "content": prompt}]
-    )
+    async with async_provider_call("openai"):
+        completion = await async_ai_client.chat.completions.create(
+            model="gpt-3.5-turbo", messages=[{"role": "system", "content": prompt}]
+        )
 
     email_content = completion.choices[0].message.content
     return email_content
 
 
+async def generate_sms_content(task, db=None, tasks=None, **kwargs):
+    # Generated once per event (llm/utils.py:event_contents), then personalized for the user of the task
+    key = get_event_content_key("send_sms", task.trigger, kwargs)
+    sms_body = await event_contents.aget_or_generate(key, lambda: generate_event_sms_content(task.trigger, **kwargs))
+    sms_content = (
+        f"Dear {FIRST_NAME_PLACEHOLDER},\n\n{sms_body.strip()}{describe_triggering_tasks(tasks or [task])}\n\n{SMS_SIGNATURE}"
+    )
+    return personalize_content(sms_content, task.user)
+
+
+def generate_digest_sms_content(user, entries):
+    # One line per buffered event, the digest is generated with a single LLM call
+    events_details = []
+    for entry in entries:
+        details = ", ".join([f"{key}: '{value}'" for key, value in entry.params.items()])
+        events_details.append(f"- Event '{entry.trigger}'{' with details: ' + details if details else ''}")
+    events_details = "\n".join(events_details)
+
+    prompt = (
+        f"Compose a brief SMS summarizing the {len(entries)} events that occurred since the last notification. Explicitly mention to whom the SMS is addressed and who the sender is. Try to understand from what service does each event come from, we have google and github at the moment and addapt the response to it\n\n"
+        f"No calls to action are needed, group similar events and just notify the user about them. The message sender name is Area-Team\n\n"
+        f"Format the message so it's complince with message (SMS) applications so the new lines and point lists, so the user has a good visualization\n\n"
+        f"Events of user {user.username}:\n{events_details}\n\nSMS:\n\nDear {user.first_name},"
+    )
+
+    with provider_call("openai"):
+        completion = aiClient.chat.completions.create(
+            model="gpt-3.5-turbo", messages=[{"role": "system", "content": prompt}]
+        )
+
+    sms_content = completion.choices[0].message.content
+    return sms_content
+
+
 def format_spanish_phone_number(phone_number: str) -> str:
     # Strip any spaces or unwanted characters (just keep digits)
     cleaned_phone_number = "".join(filter(str.isdigit, phone_number))
@@ -63,27 +108,65 @@ def send_sms_via_twilio(recipient_phone, sms_content):
         formatted_phone = format_spanish_phone_number(recipient_phone)
     except ValueError as e:
         print(f"Error formatting phone number: {e}")
-        return
+        raise
 
     client = Client(sms_general_setting.TWILIO_ACCOUNT_SID, sms_general_setting.TWILIO_AUTH_TOKEN)
 
     try:
-        message = client.messages.create(
-            body=sms_content,
-            from_=sms_general_setting.TWILIO_PHONE_NUMBER,
-            to=formatted_phone,  # Use the formatted number
-        )
+        with provider_call("twilio"):
+            message = client.messages.create(
+                body=sms_content,
+                from_=sms_general_setting.TWILIO_PHONE_NUMBER,
+                to=formatted_phone,  # Use the formatted number
+            )
         print(f"SMS successfully sent to {formatted_phone}, Message SID: {message.sid}")
     except Exception as e:
+        # Raised again so the job is retried (or dead-lettered) and the circuit breaker sees it
         print(f"Failed to send SMS: {e}")
+        raise
 
 
-def send_sms(service_from=None, task=None, db=None, **kwargs):
-    sms_content = generate_sms_content(task, db, **kwargs)
+async def send_sms_via_twilio_async(recipient_phone, sms_content):
+    # Same as send_sms_via_twilio with the REST API of Twilio on the shared HTTP client (the twilio SDK blocks)
+    try:
+        formatted_phone = format_spanish_phone_number(recipient_phone)
+    except ValueError as e:
+        print(f"Error formatting phone number: {e}")
+        raise
+
+    try:
+        async with async_provider_call("twilio"):
+            response = await http_client.post(
+                f"https://api.twilio.com/2010-04-01/Accounts/{sms_general_setting.TWILIO_ACCOUNT_SID}/Messages.json",
+                data={"Body": sms_content, "From": sms_general_setting.TWILIO_PHONE_NUMBER, "To": formatted_phone},
+                auth=(sms_general_setting.TWILIO_ACCOUNT_SID, sms_general_setting.TWILIO_AUTH_TOKEN),
+            )
+            response.raise_for_status()
+        print(f"SMS successfully sent to {formatted_phone}, Message SID: {response.json()['sid']}")
+    except Exception as e:
+        # Raised again so the job is retried (or dead-lettered) and the circuit breaker sees it
+        print(f"Failed to send SMS: {e}")
+        raise
+
+
+# Async reaction: runs on the event loop of the worker, it gets no database session (db is None)
+# `tasks`: every task of the user triggering this SMS when grouped, see task/utils.py:grouped_reactions
+async def send_sms(service_from=None, task=None, db=None, tasks=None, **kwargs):
+    sms_content = await generate_sms_content(task, db, tasks=tasks, **kwargs)
     # phone number on the user object right...??
     recipient_phone = task.user.phone_number  # Ensure this field exists in the task user object
     if recipient_phone is None:
         raise ValueError("Recipient phone number is None.")
-    send_sms_via_twilio(recipient_phone, sms_content)
+    await send_sms_via_twilio_async(recipient_phone, sms_content)
     print(f"SMS sent to {recipient_phone} with content:\n{sms_content}")
     return f"SMS sent to {recipient_phone}"
+
+
+def send_sms_digest(user, entries):
+    recipient_phone = user.phone_number
+    if recipient_phone is None:
+        raise ValueError("Recipient phone number is None.")
+    sms_content = generate_digest_sms_content(user, entries)
+    send_sms_via_twilio(recipient_phone, sms_content)
+    print(f"Digest SMS sent to {recipient_phone} with content:\n{sms_content}")
+    return f"Digest SMS sent to {recipient_phone}"
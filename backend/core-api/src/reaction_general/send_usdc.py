@@ -1,11 +1,17 @@
 from web3 import Web3
 
+from src.auth.config import auth_setting
 from src.auth.service import send_usdc
 from src.llm.llm import get_openai_client
-from src.auth.config import auth_setting
-
+from src.provider.config import provider_setting
+from src.provider.service import provider_call
 
-w3 = Web3(Web3.HTTPProvider(auth_setting.ZK_SYNC_SEPOLIA_RPC_URL))
+w3 = Web3(
+    Web3.HTTPProvider(
+        auth_setting.ZK_SYNC_SEPOLIA_RPC_URL,
+        request_kwargs={"timeout": provider_setting.PROVIDER_REQUEST_TIMEOUT_SECONDS},
+    )
+)
 aiClient = get_openai_client()
 
 
@@ -36,9 +42,10 @@ def determine_usdc_sent(task, db=None, **kwargs):
     )
 
     # Encode the prompt
-    completion = aiClient.chat.completions.create(
-        model="gpt-3.5-turbo", messages=[{"role": "system", "content": prompt}]
-    )
+    with provider_call("openai"):
+        completion = aiClient.chat.completions.create(
+            model="gpt-3.5-turbo", messages=[{"role": "system", "content": prompt}]
+        )
 
     usdc_amount_content = completion.choices[0].message.content
     return usdc_amount_content
@@ -46,7 +53,8 @@ def determine_usdc_sent(task, db=None, **kwargs):
 
 def get_usdc_balance(user_from: str):
     usdc_contract = build_usdc_contract()
-    balance = usdc_contract.functions.balanceOf(user_from).call()
+    with provider_call("zksync_rpc", sends=False):
+        balance = usdc_contract.functions.balanceOf(user_from).call()
 
     return balance
 
@@ -0,0 +1,9 @@
+# Helpers shared by the reactions of reaction_general
+
+
+def describe_triggering_tasks(tasks):
+    # Names the tasks of a grouped reaction (same event, same user), see job/service.py:enqueue_reaction_jobs
+    if len(tasks) < 2:
+        return ""
+    task_names = ", ".join(f"#{task.id} ({task.trigger})" for task in tasks)
+    return f"\n\nThis single notification covers your {len(tasks)} tasks listening to this event: {task_names}."
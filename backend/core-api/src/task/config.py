@@ -14,6 +14,20 @@ class TaskSetting(EnvFileLoader):
     GOOGLE_CLIENT_SECRET: str
     GOOGLE_OPENID_CONFIG: str
 
+    # Reaction execution (worker)
+    REACTION_MAX_CONCURRENCY: int = 500  # Reactions in flight at the same time per worker process (event loop)
+    REACTION_MAX_WORKERS: int = 8  # Threads of the blocking (sync) reactions per worker process
+    REACTION_DB_THREADS: int = 10  # Threads of the database writes of the reactions (keep below the DB pool size)
+    REACTION_EVENT_FANOUT: int = 4  # Reactions of the same event running at the same time
+    # Deadline of the reactions missing from `action_timeouts` (task/utils.py), a reaction still running after its
+    # deadline is abandoned, see task/service.py:run_sync_reaction
+    REACTION_TIMEOUT_SECONDS: float = 60.0
+    # On shutdown (SIGTERM), time given to the running reactions and digests to finish, keep it below the stop grace
+    # period
+    REACTION_DRAIN_SECONDS: float = 30.0
+
+    TASK_INDEX_REFRESH_SECONDS: int = 60  # Full rebuild of the trigger index, picks up changes made by other replicas
+
 
 task_setting = TaskSetting()
 
@@ -0,0 +1,15 @@
+class ReactionTimeoutError(Exception):
+    """
+    Raised when a reaction is still running after its deadline (see `task/utils.py:action_timeouts`).
+    `send_started` tells whether the reaction had started a call with side effects (see
+    `provider/service.py:reaction_send_started`): it may then still complete, and is not retried.
+    """
+
+    def __init__(self, action_name: str, timeout: float, send_started: bool = True):
+        self.action_name = action_name
+        self.timeout = timeout
+        self.send_started = send_started
+        super().__init__(
+            f"Reaction '{action_name}' did not finish within {timeout:.0f}s"
+            f"{'' if send_started else ' (nothing sent yet)'}"
+        )
@@ -0,0 +1,357 @@
+# In-process index of the tasks by event_hash, so `/events` resolves the subscribed tasks without querying Postgres.
+# It is built from the `task` table on startup and kept current by the task CRUD endpoints (task/router.py).
+import fnmatch
+import re
+import sys
+import threading
+import time
+from collections.abc import Callable
+from collections.abc import Sequence
+
+from sqlalchemy.orm import Session
+
+from src.task.config import task_setting
+from src.task.models import Task
+from src.task.utils import is_trigger_pattern
+
+
+class TaskDescriptor:
+    """Compact, read-only view of a task, enough to queue its reaction."""
+
+    __slots__ = ("action_name", "id", "service", "user_id")
+
+    def __init__(self, id: int, user_id: int, action_name: str, service: str):
+        self.id = id
+        self.user_id = user_id
+        self.action_name = sys.intern(action_name) if action_name else action_name
+        self.service = sys.intern(service) if service else service
+
+    def __repr__(self):
+        return f"TaskDescriptor(id={self.id}, action_name={self.action_name})"
+
+
+def glob_prefix(pattern: str) -> str:
+    """Literal characters of a glob pattern before its first wildcard."""
+    return re.split(r"[*?\[]", pattern, maxsplit=1)[0]
+
+
+def canonical_args(args: Sequence[str]) -> tuple[str, ...]:
+    """
+    Order of the trigger arguments in the trie: the literal ones sorted, then the glob patterns sorted. The events
+    are hashed over their sorted params (`generate_event_hash`), so the patterns do not depend on the order either.
+    """
+    literals = sorted(arg for arg in args if not is_trigger_pattern([arg]))
+    globs = sorted(arg for arg in args if is_trigger_pattern([arg]))
+    return tuple(literals + globs)
+
+
+class TrieNode:
+    """Level of the pattern trie, the children match the next trigger argument."""
+
+    __slots__ = ("any", "exact", "globs", "tasks")
+
+    def __init__(self):
+        self.exact: dict[str, TrieNode] = {}  # Literal arguments, a dict lookup
+        self.any: TrieNode | None = None  # "*", matches every value
+        # Other glob patterns by literal prefix -> pattern -> (compiled match, child)
+        self.globs: dict[str, dict[str, tuple[Callable, TrieNode]]] = {}
+        self.tasks: dict[int, TaskDescriptor] = {}  # Tasks whose arguments end at this level
+
+    def is_empty(self) -> bool:
+        return not (self.exact or self.any or self.globs or self.tasks)
+
+    def glob_children(self, value: str) -> list["TrieNode"]:
+        """Children of the glob patterns matching `value`, only the patterns whose prefix `value` starts with."""
+        children = []
+        for end in range(len(value) + 1):
+            patterns = self.globs.get(value[:end])
+            if patterns:
+                # Snapshot of the patterns, a task change may add or remove one meanwhile (lookups take no lock)
+                children.extend(child for glob_match, child in list(patterns.values()) if glob_match(value))
+        return children
+
+
+class PatternTrie:
+    """
+    Tasks whose trigger_args contain glob patterns (`*`, `?`, and `[...]` inside them, see `fnmatch`), for
+    example ["octocat", "*"] for any repository of the owner octocat. Like the event_hash of the exact tasks, the
+    arguments match the values of the event params in any order: each argument matches a different value. The
+    arguments are stored in `canonical_args` order, one trie level per argument under the trigger.
+
+    A lookup only visits the branches matching the event: a dict lookup per remaining value for the literal
+    arguments and "*", and the other glob patterns are indexed by their literal prefix, so only the patterns
+    whose prefix a value starts with are evaluated (the patterns starting with a wildcard are always evaluated).
+    The events have a handful of params, the ways of assigning them to the arguments stay few.
+
+    The changes (`add`, `remove`) are serialized by the lock of the `TriggerIndex`, the lookups take no lock: they
+    read every child once and only iterate snapshots of the dicts (`list`, `dict.update`), a node removed
+    meanwhile is just matched as it was.
+    """
+
+    def __init__(self):
+        self._roots: dict[str, TrieNode] = {}
+
+    def add(self, trigger: str, args: Sequence[str], descriptor: TaskDescriptor) -> None:
+        node = self._roots.setdefault(sys.intern(trigger), TrieNode())
+        for arg in canonical_args(args):
+            if arg == "*":
+                if node.any is None:
+                    node.any = TrieNode()
+                node = node.any
+            elif is_trigger_pattern([arg]):
+                patterns = node.globs.setdefault(glob_prefix(arg), {})
+                if arg not in patterns:
+                    patterns[arg] = (re.compile(fnmatch.translate(arg)).match, TrieNode())
+                node = patterns[arg][1]
+            else:
+                node = node.exact.setdefault(arg, TrieNode())
+        node.tasks[descriptor.id] = descriptor
+
+    def remove(self, trigger: str, args: Sequence[str], task_id: int) -> None:
+        root = self._roots.get(trigger)
+        if root is not None and self._remove(root, list(canonical_args(args)), task_id):
+            del self._roots[trigger]
+
+    def match(self, trigger: str, values: Sequence[str]) -> list[TaskDescriptor]:
+        root = self._roots.get(trigger)
+        if root is None:
+            return []
+
+        matched: dict[int, TaskDescriptor] = {}
+        self._match(root, tuple(sorted(values)), 0, False, matched)
+        return list(matched.values())
+
+    def descriptors(self) -> list[TaskDescriptor]:
+        descriptors = []
+        stack = list(self._roots.values())
+        while stack:
+            node = stack.pop()
+            descriptors.extend(node.tasks.values())
+            stack.extend(node.exact.values())
+            stack.extend(child for patterns in node.globs.values() for _, child in patterns.values())
+            if node.any is not None:
+                stack.append(node.any)
+        return descriptors
+
+    def _match(
+        self, node: TrieNode, remaining: tuple[str, ...], start: int, in_globs: bool, matched: dict[int, TaskDescriptor]
+    ) -> None:
+        """
+        Matches the `remaining` values (sorted) against the levels under `node`. The literal arguments come first
+        in sorted order, so they take the values from `start` on; the glob arguments may take any value.
+        """
+        if not remaining:
+            matched.update(node.tasks)
+            return
+
+        if not in_globs:
+            for i in range(start, len(remaining)):
+                if i > start and remaining[i] == remaining[i - 1]:
+                    continue  # Same value, same branches
+                child = node.exact.get(remaining[i])
+                if child is not None:
+                    self._match(child, remaining[:i] + remaining[i + 1 :], i, False, matched)
+
+        any_child = node.any  # Read once, a concurrent remove may reset it
+        if any_child is None and not node.globs:
+            return
+        for i, value in enumerate(remaining):
+            if i > 0 and value == remaining[i - 1]:
+                continue
+            rest = remaining[:i] + remaining[i + 1 :]
+            if any_child is not None:
+                self._match(any_child, rest, 0, True, matched)
+            for child in node.glob_children(value):
+                self._match(child, rest, 0, True, matched)
+
+    def _remove(self, node: TrieNode, args: list[str], task_id: int) -> bool:
+        """Removes the task under `node`, returns True if `node` is left empty."""
+        if not args:
+            node.tasks.pop(task_id, None)
+            return node.is_empty()
+
+        arg, rest = args[0], args[1:]
+        if arg == "*":
+            if node.any is not None and self._remove(node.any, rest, task_id):
+                node.any = None
+        elif is_trigger_pattern([arg]):
+            prefix = glob_prefix(arg)
+            patterns = node.globs.get(prefix)
+            if patterns is not None and arg in patterns and self._remove(patterns[arg][1], rest, task_id):
+                del patterns[arg]
+                if not patterns:
+                    del node.globs[prefix]
+        elif arg in node.exact and self._remove(node.exact[arg], rest, task_id):
+            del node.exact[arg]
+        return node.is_empty()
+
+
+class TriggerIndex:
+    """
+    Maps an event_hash to the descriptors of its tasks. The tasks with glob patterns in their trigger_args
+    are kept in a `PatternTrie` instead, the exact tasks keep the hash lookup.
+
+    Other replicas of core-api may modify the `task` table, so the index is also rebuilt every
+    `TASK_INDEX_REFRESH_SECONDS` (see `ensure_fresh`). A single request rebuilds it while the others keep using
+    the current index. Every change (`add`, `remove`...) bumps the generation of the index: the rebuild records
+    the generation its snapshot of the table was read at, and applies again on the rebuilt index the changes of
+    the later generations, as the snapshot may predate them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()  # Single rebuild at a time
+        self._tasks_by_hash: dict[str, dict[int, TaskDescriptor]] = {}
+        self._hash_by_task: dict[int, str] = {}
+        self._patterns = PatternTrie()
+        self._pattern_by_task: dict[int, tuple[str, tuple[str, ...]]] = {}  # task_id -> (trigger, trigger_args)
+        self._built_at: float | None = None
+        self._generation = 0  # Number of changes applied to the index
+        # (generation, change, args) of the changes made while a rebuild runs (None when no rebuild runs)
+        self._changes: list[tuple[int, Callable, tuple]] | None = None
+
+    def build(self, db: Session) -> None:
+        with self._build_lock:
+            self._build(db)
+
+    def _build(self, db: Session) -> None:
+        with self._lock:
+            snapshot_generation = self._generation  # The table is read after the changes up to this generation
+            self._changes = []
+
+        try:
+            rows = db.query(
+                Task.id, Task.event_hash, Task.user_id, Task.action_name, Task.service, Task.trigger, Task.trigger_args
+            ).all()
+
+            tasks_by_hash: dict[str, dict[int, TaskDescriptor]] = {}
+            hash_by_task: dict[int, str] = {}
+            patterns = PatternTrie()
+            pattern_by_task: dict[int, tuple[str, tuple[str, ...]]] = {}
+            for task_id, event_hash, user_id, action_name, service, trigger, trigger_args in rows:
+                descriptor = TaskDescriptor(task_id, user_id, action_name, service)
+                if is_trigger_pattern(trigger_args):
+                    patterns.add(trigger, trigger_args, descriptor)
+                    pattern_by_task[task_id] = (trigger, tuple(trigger_args))
+                    continue
+                event_hash = sys.intern(event_hash)
+                tasks_by_hash.setdefault(event_hash, {})[task_id] = descriptor
+                hash_by_task[task_id] = event_hash
+        except Exception:
+            with self._lock:
+                self._changes = None  # The current index stays, with the changes already applied in place
+            raise
+
+        with self._lock:
+            # The changes of the current index newer than the snapshot, in the order they were made
+            changes = [(change, args) for generation, change, args in self._changes if generation > snapshot_generation]
+            self._changes = None
+            self._tasks_by_hash = tasks_by_hash
+            self._hash_by_task = hash_by_task
+            self._patterns = patterns
+            self._pattern_by_task = pattern_by_task
+            for change, args in changes:
+                change(*args)
+            self._built_at = time.monotonic()
+            generation = self._generation
+
+        print(
+            f"Trigger index built with {len(hash_by_task)} tasks and {len(tasks_by_hash)} event hashes, "
+            f"{len(pattern_by_task)} pattern tasks, {len(changes)} changes replayed (generation {generation})"
+        )
+
+    def ensure_fresh(self, db: Session) -> None:
+        """
+        Rebuilds the index once it is older than `TASK_INDEX_REFRESH_SECONDS`. Only the first request blocks
+        until the index exists, afterwards a stale index is rebuilt by one request and read by the others.
+        """
+        if self._built_at is not None and time.monotonic() - self._built_at <= task_setting.TASK_INDEX_REFRESH_SECONDS:
+            return
+        if not self._build_lock.acquire(blocking=self._built_at is None):
+            return  # Another request is rebuilding it
+        try:
+            # Rebuilt by another request while this one waited for the lock
+            if self._built_at is None or time.monotonic() - self._built_at > task_setting.TASK_INDEX_REFRESH_SECONDS:
+                self._build(db)
+        finally:
+            self._build_lock.release()
+
+    def lookup(self, event_hash: str) -> tuple[TaskDescriptor, ...]:
+        """Returns the tasks whose event_hash is `event_hash`, the pattern tasks are matched by `match_patterns`."""
+        tasks = self._tasks_by_hash.get(event_hash)
+        return tuple(tasks.values()) if tasks else ()  # A snapshot, a change may update the dict meanwhile
+
+    def match_patterns(self, trigger: str, values: Sequence[str]) -> list[TaskDescriptor]:
+        """Returns the pattern tasks of `trigger` matching the event param `values`."""
+        if not self._pattern_by_task:
+            return []
+        return self._patterns.match(trigger, values)
+
+    def add(self, task: Task) -> None:
+        """Adds or updates a task, call it after the task is committed."""
+        descriptor = TaskDescriptor(task.id, task.user_id, task.action_name, task.service)
+        trigger_args = tuple(task.trigger_args) if task.trigger_args is not None else None
+        self._change(self._add, descriptor, task.event_hash, task.trigger, trigger_args)
+
+    def remove(self, task_id: int) -> None:
+        self._change(self._discard, task_id)
+
+    def remove_user(self, user_id: int) -> None:
+        """Removes every task of a user (tasks are deleted on cascade with the user)."""
+        self._change(self._remove_user, user_id)
+
+    def clear(self) -> None:
+        self._change(self._clear)
+
+    def _change(self, change: Callable, *args) -> None:
+        with self._lock:
+            change(*args)
+            self._generation += 1
+            if self._changes is not None:
+                self._changes.append((self._generation, change, args))
+
+    def _add(self, descriptor: TaskDescriptor, event_hash: str, trigger: str, trigger_args: tuple | None) -> None:
+        self._discard(descriptor.id)
+        if is_trigger_pattern(trigger_args):
+            self._patterns.add(trigger, trigger_args, descriptor)
+            self._pattern_by_task[descriptor.id] = (trigger, trigger_args)
+            return
+        event_hash = sys.intern(event_hash)
+        self._tasks_by_hash.setdefault(event_hash, {})[descriptor.id] = descriptor
+        self._hash_by_task[descriptor.id] = event_hash
+
+    def _remove_user(self, user_id: int) -> None:
+        task_ids = [
+            task_id
+            for tasks in self._tasks_by_hash.values()
+            for task_id, descriptor in tasks.items()
+            if descriptor.user_id == user_id
+        ]
+        task_ids.extend(descriptor.id for descriptor in self._patterns.descriptors() if descriptor.user_id == user_id)
+        for task_id in task_ids:
+            self._discard(task_id)
+
+    def _clear(self) -> None:
+        self._tasks_by_hash = {}
+        self._hash_by_task = {}
+        self._patterns = PatternTrie()
+        self._pattern_by_task = {}
+
+    def _discard(self, task_id: int) -> None:
+        pattern = self._pattern_by_task.pop(task_id, None)
+        if pattern is not None:
+            self._patterns.remove(pattern[0], pattern[1], task_id)
+            return
+
+        event_hash = self._hash_by_task.pop(task_id, None)
+        if event_hash is None:
+            return
+
+        tasks = self._tasks_by_hash.get(event_hash)
+        if tasks is not None:
+            tasks.pop(task_id, None)
+            if not tasks:
+                del self._tasks_by_hash[event_hash]
+
+
+trigger_index = TriggerIndex()
@@ -4,8 +4,10 @@ from sqlalchemy import Boolean
 from sqlalchemy import Column
 from sqlalchemy import DateTime
 from sqlalchemy import ForeignKey
+from sqlalchemy import Index
 from sqlalchemy import Integer
 from sqlalchemy import String
+from sqlalchemy import UniqueConstraint
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 
@@ -30,6 +32,17 @@ class Task(Base):
     requires_oauth = Column(Boolean, default=False)
     oauth_token = Column(String, nullable=True)
     service = Column(String, nullable=False)  # Store the service here
+    # Person filter of the email_received_from_person / email_sent_to_person tasks, taken from trigger_args
+    email_filter = Column(String, nullable=True)  # "only_from" or "only_to"
+    email_filter_address = Column(String, nullable=True)
+    # Events with the same event_hash received within this window are merged into a single reaction
+    coalesce_seconds = Column(Integer, nullable=True)
+    # Digest mode (send_email / send_sms): the events are buffered and delivered in a single message every interval
+    digest_seconds = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_task_user_id_trigger_email_filter", "user_id", "trigger", "email_filter", "email_filter_address"),
+    )
 
 
 # this is gmail messages that are processed
@@ -38,7 +51,10 @@ class ProcessedMessage(Base):
     __tablename__ = "processed_messages"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    message_id = Column(String, unique=True, index=True)
+    message_id = Column(String, index=True)
     user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"))
     user = relationship("User", back_populates="processed_messages")  # Relationship to User
     processed_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    # Gmail message ids are unique per mailbox, the insert-on-conflict dedupe of /events relies on it
+    __table_args__ = (UniqueConstraint("user_id", "message_id", name="uq_processed_messages_user_id_message_id"),)
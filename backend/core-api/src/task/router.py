@@ -11,6 +11,7 @@ from src.auth.models import GoogleToken
 from src.auth.models import Token
 from src.database import db_dependency
 from src.task.config import task_setting
+from src.task.index import trigger_index
 from src.task.models import Task
 from src.task.schemas import TaskCreateRequest
 from src.task.schemas import TaskPartialUpdateRequest
@@ -19,7 +20,9 @@ from src.task.utils import action_registry
 from src.task.utils import action_to_params
 from src.task.utils import event_registry
 from src.task.utils import generate_event_hash
+from src.task.utils import get_email_filter
 from src.task.utils import is_valid_action
+from src.task.utils import is_valid_digest
 from src.user.models import User
 
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
@@ -278,6 +281,8 @@ params -> Important: `trigger_args` must be the same as in `EventPayload.params`
 
 - This is crucial since the `event_hash` is generated from the trigger, `trigger_args` for the task, 
   `event_name`, and `params` for the event.
+- `trigger_args` may contain glob patterns (`*`, `?`), e.g. ["octocat", "*"] for any repo of the owner octocat.
+  A pattern task matches the events whose `params` values match its `trigger_args` in any order, each argument against a different value (same count).
 - Additionally, `params` refers to extra parameters linked to the task but not to the event 
   (e.g., the service and the `oauth_token`). This allows the microservice to know which auth token 
   to use, and when tasks are executed, we can know which service is being used.
@@ -315,6 +320,9 @@ def create_task(db: db_dependency, task_request: TaskCreateRequest):
     if not is_valid_action(task_request.action_name):
         raise HTTPException(status_code=400, detail="Invalid trigger or action name")
 
+    if not is_valid_digest(task_request.action_name, task_request.digest_seconds):
+        raise HTTPException(status_code=400, detail="Digest mode is not supported by this action")
+
     service = task_request.params.get("service")
     oauth_token = task_request.params.get("oauth_token")  # can be none if not needed
 
@@ -349,6 +357,8 @@ def create_task(db: db_dependency, task_request: TaskCreateRequest):
         else:
             print(f"Tas k is not a special one {task_request.trigger}")
 
+    email_filter, email_filter_address = get_email_filter(task_request.trigger_args)
+
     create_task_model = Task(
         trigger=task_request.trigger,
         trigger_args=task_request.trigger_args,
@@ -359,10 +369,15 @@ def create_task(db: db_dependency, task_request: TaskCreateRequest):
         oauth_token=oauth_token,
         service=service,
         event_hash=hash,
+        email_filter=email_filter,
+        email_filter_address=email_filter_address,
+        coalesce_seconds=task_request.coalesce_seconds,
+        digest_seconds=task_request.digest_seconds,
     )
 
     db.add(create_task_model)
     db.commit()
+    trigger_index.add(create_task_model)
 
     return {"message": "Task created successfully"}
 
@@ -398,6 +413,7 @@ def delete_task(db: db_dependency, task_id: int):
 
     db.delete(task)
     db.commit()
+    trigger_index.remove(task_id)
 
     return {"message": "Task deleted successfully"}
 
@@ -420,6 +436,9 @@ def update_task(task_id: int, task_request: TaskUpdateRequest, db: db_dependency
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
+    if not is_valid_digest(task_request.action_name, task_request.digest_seconds):
+        raise HTTPException(status_code=400, detail="Digest mode is not supported by this action")
+
     # Update all fields
     task.trigger = task_request.trigger
     task.trigger_args = task_request.trigger_args
@@ -429,12 +448,16 @@ def update_task(task_id: int, task_request: TaskUpdateRequest, db: db_dependency
     task.service = task_request.service
     task.oauth_token = task_request.oauth_token
     task.requires_oauth = task_request.requires_oauth
+    task.coalesce_seconds = task_request.coalesce_seconds
+    task.digest_seconds = task_request.digest_seconds
 
-    # Recompute event_hash
+    # Recompute event_hash and person filter
     task.event_hash = generate_event_hash(task.trigger, task.trigger_args)
+    task.email_filter, task.email_filter_address = get_email_filter(task.trigger_args)
 
     db.commit()
     db.refresh(task)
+    trigger_index.add(task)
 
     return task
 
@@ -447,13 +470,19 @@ def partial_update_task(task_id: int, task_request: TaskPartialUpdateRequest, db
 
     # Update only the fields provided in the request
     update_data = task_request.dict(exclude_unset=True)
+    # Checked against the stored values of the fields not provided
+    action_name = update_data.get("action_name", task.action_name)
+    if not is_valid_digest(action_name, update_data.get("digest_seconds", task.digest_seconds)):
+        raise HTTPException(status_code=400, detail="Digest mode is not supported by this action")
     for field, value in update_data.items():
         setattr(task, field, value)
 
-    # Recompute event_hash if necessary
+    # Recompute event_hash and person filter if necessary
     task.event_hash = generate_event_hash(task.trigger, task.trigger_args)
+    task.email_filter, task.email_filter_address = get_email_filter(task.trigger_args)
 
     db.commit()
     db.refresh(task)
+    trigger_index.add(task)
 
     return task
@@ -25,6 +25,8 @@ class TaskCreateRequest(BaseModel):
     action_params: Optional[List[str]]
     user_id: int
     params: Dict[str, Optional[str]]
+    coalesce_seconds: Optional[int] = Field(None, ge=1)
+    digest_seconds: Optional[int] = Field(None, ge=60)
 
     class Config:
         from_attributes = True
@@ -51,6 +53,8 @@ class TaskUpdateRequest(BaseModel):
     service: str
     oauth_token: Optional[str]
     requires_oauth: bool
+    coalesce_seconds: Optional[int] = Field(None, ge=1)
+    digest_seconds: Optional[int] = Field(None, ge=60)
 
     class Config:
         from_attributes = True
@@ -85,6 +89,8 @@ class TaskPartialUpdateRequest(BaseModel):
     service: Optional[str] = None
     oauth_token: Optional[str] = None
     requires_oauth: Optional[bool] = None
+    coalesce_seconds: Optional[int] = Field(None, ge=1)
+    digest_seconds: Optional[int] = Field(None, ge=60)
 
     class Config:
         from_attributes = True
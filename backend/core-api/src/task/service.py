@@ -1,11 +1,37 @@
 # This file is made for defining actions linked to the taks
-from typing import List
+import asyncio
+import contextvars
+import threading
+import time
+import traceback
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import datetime
+from datetime import timezone
 
-from sqlalchemy import String
 from sqlalchemy.orm import Session
-import traceback
+from sqlalchemy.orm import joinedload
+
+from src.auth.models import Token
+from src.database import SessionLocal
+from src.digest.service import buffer_digest_entry
+from src.job.models import ReactionJob
+from src.job.service import finish_reaction_job
+from src.job.utils import Shutdown
+from src.job.utils import record_reaction_execution
+from src.provider.rate_limit import reaction_deadline
+from src.provider.service import reaction_send_started
+from src.task.config import task_setting
+from src.task.exceptions import ReactionTimeoutError
 from src.task.models import Task
 from src.task.utils import action_registry
+from src.task.utils import digest_registry
+from src.task.utils import get_action_timeout
+from src.user.models import User
+
+# Reactions in flight in the worker process, the blocking ones are also limited to REACTION_MAX_WORKERS threads
+reaction_slots = asyncio.Semaphore(task_setting.REACTION_MAX_CONCURRENCY)
+sync_reaction_slots = asyncio.Semaphore(task_setting.REACTION_MAX_WORKERS)
 
 
 def get_action_func(event_service, action_name):
@@ -35,42 +61,229 @@ def get_action_func(event_service, action_name):
     raise KeyError(f"Action '{action_name}' not found for event '{event_service}', common, reddit, or crypto actions")
 
 
-# {
-#   "event_name": "push_event",
-#   "service": "github",
-#   "params": {
-#       "service": "github"}
-# }
+def load_reaction_tasks(db: Session, task_ids: Iterable[int]) -> dict[int, Task]:
+    """
+    Loads the tasks of a batch of jobs with everything the reactions read (user, tokens) in a single query,
+    whatever the number of tasks subscribed to the events.
+
+    Args:
+        db (Session): The database session, it should not expire the tasks on commit as they are read once closed.
+        task_ids (Iterable[int]): The ids of the tasks to load.
+
+    Returns:
+        dict[int, Task]: The tasks by id, a task deleted since its job was claimed is missing.
+    """
+    tasks = (
+        db.query(Task)
+        .options(joinedload(Task.user).joinedload(User.token).joinedload(Token.google_token))
+        .filter(Task.id.in_(set(task_ids)))
+        .all()
+    )
+    return {task.id: task for task in tasks}
+
+
+def get_job_tasks(job: ReactionJob, tasks: dict[int, Task]) -> list[Task]:
+    """
+    Returns the tasks executed by a job: its task, or every task of a grouped reaction (`ReactionJob.task_ids`).
+    The tasks deleted since the job was queued are left out.
+    """
+    return [tasks[task_id] for task_id in job.task_ids or [job.task_id] if task_id in tasks]
 
 
 # event is getted on the reciever and kwargs also... (knwars can we whatever...)
-def execute_actions(
-    db: Session, special_tasks: List[Task], event_name: String, service: String, event_hash: String, **kwargs
-):
-    tasks_with_event = db.query(Task).filter(Task.event_hash == event_hash).all()
-    if special_tasks:
-        tasks_with_event += special_tasks
-    action_name = None
-    print("tasks_with_event", tasks_with_event)
-    for task in tasks_with_event:
-        action_name = task.action_name
-        print("action_name on task", action_name)
-        action, is_common = get_action_func(service, task.action_name)
+async def execute_actions(jobs: list[ReactionJob], stopping: Shutdown | None = None) -> list[ReactionJob]:
+    """
+    Executes the reactions of the claimed jobs concurrently on the event loop of the worker. At most
+    `REACTION_MAX_CONCURRENCY` reactions run at the same time, and at most `REACTION_EVENT_FANOUT` of the same
+    event, so one event with a lot of subscribed tasks does not take every slot.
+
+    The tasks of the whole batch are loaded upfront in one query (`load_reaction_tasks`) and handed to the
+    reactions, which then only query the database for their own writes. A grouped job (identical reactions to
+    the same user for the same event, see `enqueue_reaction_jobs`) runs its reaction once for all its tasks.
+
+    Once `stopping` is set no other reaction is started, and the running ones get until its drain deadline to
+    finish. The reactions still running after it are cancelled, and their jobs are finished according to whether
+    their provider send had started, so they do not keep their lease to be blindly run again.
+
+    Args:
+        jobs (list[ReactionJob]): The jobs claimed by the worker.
+        stopping (Shutdown, optional): Set when the worker is shutting down.
+
+    Returns:
+        list[ReactionJob]: The jobs whose reaction was not started because of the shutdown.
+    """
+    task_ids = [task_id for job in jobs for task_id in job.task_ids or [job.task_id]]
+    tasks = await asyncio.to_thread(run_load_reaction_tasks, task_ids)
+
+    event_slots = defaultdict(lambda: asyncio.Semaphore(task_setting.REACTION_EVENT_FANOUT))
+    scheduled = []
+    started = set()
+
+    async def run(job: ReactionJob, job_tasks: list[Task]):
+        async with reaction_slots, event_slots[job.event_hash]:
+            if stopping is not None and stopping.is_set():
+                return
+            started.add(job.id)
+            await execute_reaction_job(job, job_tasks[0], job_tasks[1:])
+
+    running = set()
+    for job in jobs:
+        job_tasks = get_job_tasks(job, tasks)
+        if not job_tasks:
+            continue  # The task was deleted, its job went with it (on delete cascade)
+        scheduled.append(job)
+        running.add(asyncio.create_task(run(job, job_tasks)))
+
+    while running:
+        # With a timeout so the shutdown is noticed while the reactions run
+        _, running = await asyncio.wait(running, timeout=1.0, return_when=asyncio.FIRST_COMPLETED)
+
+        if running and stopping is not None and stopping.is_set() and not stopping.remaining():
+            # The reactions still running finish their jobs when cancelled (execute_reaction_job), and the ones still
+            # waiting for a slot are returned with the other jobs not started
+            print(f"Drain budget exhausted, interrupting {len(running)} reactions")
+            for reaction in running:
+                reaction.cancel()
+            await asyncio.wait(running)
+            break
+
+    return [job for job in scheduled if job.id not in started]
+
+
+def run_load_reaction_tasks(task_ids: list[int]) -> dict[int, Task]:
+    with SessionLocal(expire_on_commit=False) as db:
+        return load_reaction_tasks(db, task_ids)
+
+
+async def execute_reaction_job(job: ReactionJob, task: Task, grouped_tasks: list[Task] | None = None):
+    """
+    Executes the reaction of a single job with its own database session, a failing reaction is retried later
+    (or dead-lettered, see `finish_reaction_job`) and does not affect the other reactions.
+
+    The task comes prefetched with its user and tokens (`load_reaction_tasks`), so no connection is checked
+    out before the reaction writes: the calls to OpenAI, SMTP, Twilio... are made without holding one. The
+    database writes of the job run on the default executor of the loop.
+
+    The reaction runs under its deadline: an `async def` reaction is cancelled when it passes, a sync reaction
+    (`run_sync_reaction`) is abandoned. The job is then finished with a `ReactionTimeoutError`, retried only if
+    the reaction had not started its provider send yet.
+
+    Every execution is recorded in `reaction_execution` (latency, outcome) through a batched writer.
+
+    Args:
+        job (ReactionJob): The claimed job, detached from the session of the worker.
+        task (Task): The task of the job with its user, token and google_token loaded.
+        grouped_tasks (list[Task], optional): The other tasks of a grouped job (`ReactionJob.task_ids`), the
+            reaction gets every task in `tasks`.
+    """
+    with SessionLocal(expire_on_commit=False) as db:
+        job = db.merge(job, load=False)  # Attached for the writes of finish_reaction_job, without a SELECT
+
+        params = job.params
+        if grouped_tasks:
+            params = {**params, "tasks": [task, *grouped_tasks]}
+
+        if task.digest_seconds and task.action_name in digest_registry:
+            # Delivered later with the other buffered events of the user (src/digest/service.py)
+            await asyncio.to_thread(buffer_digest_entry, db, task, job.params)
+            await asyncio.to_thread(finish_reaction_job, db, job)
+            return
+
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        timeout = get_action_timeout(task.action_name)
+        reaction_deadline.set(time.monotonic() + timeout)  # Read by the rate limiter of the providers
+        send_started = threading.Event()  # Set by the provider calls with side effects
+        reaction_send_started.set(send_started)
         try:
-            execute_action(action, is_common, task, db, **kwargs)
+            action, is_common = get_action_func(job.service, task.action_name)
+            if asyncio.iscoroutinefunction(action):
+                # Async reactions get no session, a blocking database call would stall every other reaction
+                reaction = execute_action(action, is_common, task, None, **params)
+            else:
+                reaction = run_sync_reaction(task.action_name, action, is_common, task, params)
+            await asyncio.wait_for(reaction, timeout)
+        except asyncio.CancelledError:
+            # Interrupted by the shutdown of the worker (execute_actions), the job is finished here instead of keeping
+            # its lease: dead-lettered if the provider send had started, retried otherwise
+            e = ReactionTimeoutError(task.action_name, time.perf_counter() - start, send_started.is_set())
+            print(f"ERROR executing action '{task.action_name}' for task '{task}': {e}")
+            record_reaction_execution(job, task.action_name, started_at, time.perf_counter() - start, error=e)
+            await asyncio.to_thread(finish_reaction_job, db, job, e)
+            raise
         except Exception as e:
-            print(f"ERROR executing action '{action_name}' for task '{task}': {e}")
+            if isinstance(e, asyncio.TimeoutError):
+                e = ReactionTimeoutError(task.action_name, timeout, send_started.is_set())
+            print(f"ERROR executing action '{task.action_name}' for task '{task}': {e}")
             # Optionally, you can log the exception traceback for more details
             traceback.print_exc()
-            # Continue with the next task
-            print("CONTINUING with the next task...")
-            continue
-    return action_name
+            record_reaction_execution(job, task.action_name, started_at, time.perf_counter() - start, error=e)
+            await asyncio.to_thread(finish_reaction_job, db, job, e)
+            return
+        record_reaction_execution(job, task.action_name, started_at, time.perf_counter() - start)
+        await asyncio.to_thread(finish_reaction_job, db, job)
+
+
+def run_action(action, is_common, task: Task, params: dict):
+    """Executes a sync reaction with a database session of its own, so an abandoned reaction keeps its session."""
+    with SessionLocal(expire_on_commit=False) as db:
+        return execute_action(action, is_common, task, db, **params)
+
+
+async def run_sync_reaction(action_name: str, action, is_common, task: Task, params: dict):
+    """
+    Compatibility shim of the blocking reactions (smtplib, praw, twilio, web3...): the reaction runs on a daemon
+    thread holding one of the `REACTION_MAX_WORKERS` sync slots, and the event loop awaits its result.
+
+    Python threads cannot be killed: when the reaction is cancelled (deadline passed) the thread is abandoned,
+    and it ends on its own (the provider clients have socket timeouts, see `PROVIDER_REQUEST_TIMEOUT_SECONDS`).
+    Its slot is only released when the thread ends, so abandoned threads count against the limit: there are never
+    more than `REACTION_MAX_WORKERS` blocking reaction threads, and a stuck provider delays the new blocking
+    reactions instead of piling up threads.
+
+    Returns:
+        The value returned by the reaction.
+
+    Raises:
+        Exception: The exception raised by the reaction.
+    """
+    await sync_reaction_slots.acquire()
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    context = contextvars.copy_context()  # Carries the deadline of the reaction to its thread
+
+    def set_outcome(result=None, error=None):
+        if future.done():
+            return  # Abandoned
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def target():
+        try:
+            result = context.run(run_action, action, is_common, task, params)
+        except Exception as e:
+            outcome = (None, e)
+        else:
+            outcome = (result, None)
+        try:
+            loop.call_soon_threadsafe(set_outcome, *outcome)
+            loop.call_soon_threadsafe(sync_reaction_slots.release)
+        except RuntimeError:
+            pass  # The event loop is closed (worker stopped), nothing waits for the reaction anymore
+
+    try:
+        threading.Thread(target=target, name=f"reaction-{action_name}", daemon=True).start()
+    except BaseException:
+        sync_reaction_slots.release()
+        raise
+    return await future
 
 
 # exacution for common aciton we want extra info fo the service in order to render dyamci templates for generic emails sms...
 def execute_action(action, is_common, task, db, **kwargs):
-    # if common pass the service from...
+    # if common pass the service from... (returns a coroutine for the async reactions)
     if is_common:
         service_from = kwargs.get("service_from")
         return action(service_from=service_from, task=task, db=db, **kwargs)
@@ -15,8 +15,11 @@ from src.reaction_general.reddit import post_new_comment_on_post
 from src.reaction_general.reddit import post_new_submission
 from src.reaction_general.reddit import send_private_message
 from src.reaction_general.send_email import send_email
+from src.reaction_general.send_email import send_email_digest
 from src.reaction_general.send_sms import send_sms
+from src.reaction_general.send_sms import send_sms_digest
 from src.reaction_general.send_usdc import transfer_usdc
+from src.task.config import task_setting
 from src.task.schemas import CalendarCalendarReactionsArgsFronted
 from src.task.schemas import CalendarReactionsArgs
 from src.task.schemas import PostNewCommentOnPostArgs
@@ -38,6 +41,8 @@ def is_valid_action(action_name):
 
 
 # GENERAL ACTION REGISTRY we have comon acitons and acitons linkded to specific microservices
+# A reaction is either a plain function, run on a thread with its own database session, or an `async def`
+# running on the event loop of the worker (no database session, use shared clients of src/provider/clients.py).
 
 action_registry = {
     "common": {
@@ -62,6 +67,38 @@ action_registry = {
     },
 }
 
+# Reactions supporting the digest mode (Task.digest_seconds) -> function delivering the buffered events of a user
+digest_registry = {
+    "send_email": send_email_digest,
+    "send_sms": send_sms_digest,
+}
+
+
+def is_valid_digest(action_name: str | None, digest_seconds: int | None) -> bool:
+    """Digest mode (`digest_seconds`) is only allowed for the reactions of `digest_registry`."""
+    return not digest_seconds or action_name in digest_registry
+
+
+# Reactions messaging the user of the task: the tasks of the same user matching the same event get a single job, the
+# reaction gets every triggering task in `tasks` (see job/service.py:enqueue_reaction_jobs)
+grouped_reactions = {"send_email", "send_sms"}
+
+# Deadline in seconds of each reaction, `REACTION_TIMEOUT_SECONDS` for the reactions missing here
+action_timeouts = {
+    "send_email": 45,  # OpenAI completion + SMTP
+    "send_sms": 45,  # OpenAI completion + Twilio
+    "create_google_cal_event": 30,
+    "send_usdc": 120,  # Waits for the RPC node: connection, nonce, gas estimation and the raw transaction
+    "send_private_message": 30,
+    "post_new_submission": 30,
+    "post_new_comment_on_post": 45,  # Reads the post before replying
+}
+
+
+def get_action_timeout(action_name: str) -> float:
+    return action_timeouts.get(action_name, task_setting.REACTION_TIMEOUT_SECONDS)
+
+
 # reaction_params neede for the (reactions) -> **action_params** (none if not needed)
 action_to_params = {
     "send_email": None,
@@ -91,6 +128,29 @@ event_registry = {
 }
 
 
+def is_trigger_pattern(trigger_args: list | None) -> bool:
+    """
+    Returns True if one of the trigger arguments is a glob pattern ("*", "?"), the task then matches the events
+    whose params match the patterns in any order (see `task/index.py:PatternTrie`) instead of the exact event_hash.
+    """
+    return bool(trigger_args) and any("*" in arg or "?" in arg for arg in trigger_args)
+
+
+def get_email_filter(trigger_args: list | None) -> tuple[str | None, str | None]:
+    """
+    Extracts the person filter of an email task, its trigger_args are [project, topic, email, "only_from" | "only_to"].
+
+    Args:
+        trigger_args (list | None): The trigger arguments of the task.
+    Returns:
+        tuple[str | None, str | None]: The filter ("only_from" or "only_to") and the filtered email address,
+        (None, None) if the task has no person filter.
+    """
+    if trigger_args and len(trigger_args) >= 4 and trigger_args[3] in ("only_from", "only_to"):
+        return trigger_args[3], trigger_args[2]
+    return None, None
+
+
 """
 3. Why You Should Use Deterministic Hashing (e.g., SHA256) Instead of bcrypt
 Since you're comparing the hash directly between stored and computed values,
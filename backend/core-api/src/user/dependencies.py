@@ -46,3 +46,13 @@ def get_current_active_user(current_user: current_user_dependency):
 
 current_active_user_dependency = Annotated[UserInDB, Depends(get_current_active_user)]
 """Checks that -> JWT token is valid -> User exists in the database -> User is active"""
+
+
+def get_current_admin_user(current_user: current_active_user_dependency):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
+
+
+current_admin_user_dependency = Annotated[UserInDB, Depends(get_current_admin_user)]
+"""Checks that -> JWT token is valid -> User exists in the database -> User is active -> User is an admin"""
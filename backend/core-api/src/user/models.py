@@ -21,7 +21,7 @@ class User(Base):
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     username = Column(String, index=True, unique=True)
-    email = Column(String)
+    email = Column(String, index=True)
     phone_number = Column(String, nullable=True)
     first_name = Column(String)
     last_name = Column(String)
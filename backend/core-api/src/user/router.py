@@ -8,6 +8,7 @@ from starlette import status
 from src.auth.schemas import GoogleTokenInDB
 from src.auth.service import bcrypt_hash
 from src.database import db_dependency
+from src.task.index import trigger_index
 from src.user.dependencies import current_active_user_dependency
 from src.user.models import GmailWebHookInfo
 from src.user.models import User as UserModel
@@ -68,6 +69,7 @@ def delete_user(db: db_dependency):
 
     db.query(UserModel).delete()
     db.commit()
+    trigger_index.clear()  # Tasks are deleted on cascade
 
 
 @router.get(
@@ -158,6 +160,7 @@ def delete_user(db: db_dependency, user_id: int = Path(ge=0)):
 
     db.query(UserModel).filter(UserModel.id == user_id).delete()
     db.commit()
+    trigger_index.remove_user(user_id)  # Tasks are deleted on cascade
 
 
 @router.get(
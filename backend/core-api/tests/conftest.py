@@ -0,0 +1,24 @@
+from functools import cache
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+@cache
+def database_available() -> bool:
+    from src.database import engine
+
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except OperationalError as e:
+        print(f"PostgreSQL is not reachable, skipping the database tests: {e}")
+        return False
+    return True
+
+
+def pytest_runtest_setup(item):
+    # Before the fixtures of the test, they may write to the database too
+    if item.get_closest_marker("database") and not database_available():
+        pytest.skip("PostgreSQL is not reachable (DB_URL)")
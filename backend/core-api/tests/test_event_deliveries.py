@@ -0,0 +1,24 @@
+import uuid
+
+import pytest
+
+from src.database import SessionLocal
+from src.event.models import EventDelivery
+from src.event.utils import claim_deliveries
+
+pytestmark = pytest.mark.database
+
+
+def test_delivery_is_claimed_once():
+    delivery_id = str(uuid.uuid4())
+    try:
+        # Two replicas receiving the same webhook delivery
+        with SessionLocal() as first, SessionLocal() as second:
+            assert claim_deliveries(first, {delivery_id}) == {delivery_id}
+            first.commit()
+            assert claim_deliveries(second, {delivery_id}) == set()
+            second.commit()
+    finally:
+        with SessionLocal() as db:
+            db.query(EventDelivery).filter(EventDelivery.delivery_id == delivery_id).delete()
+            db.commit()
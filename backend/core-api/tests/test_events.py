@@ -23,7 +23,7 @@ def test_handle_event_success():
         "service": "github"
     }
     response = requests.post(BASE_URL, json=payload)
-    assert response.status_code == 200
+    assert response.status_code == 202
     assert response.json() == {"detail": "Event handled"}
 
 def test_handle_event_missing_fields():
@@ -35,6 +35,27 @@ def test_handle_event_missing_fields():
     assert response.status_code == 422
     assert 'detail' in response.json()
 
+def test_handle_event_batch_success():
+    payload = [
+        {
+            "context_params": {"author": "testuser", "commit_msg": f"Commit {i}"},
+            "event_name": "push_event",
+            "params": {"branch": "main", "repo": "test-repo"},
+            "service": "github"
+        }
+        for i in range(3)
+    ]
+    response = requests.post(f'{BASE_URL}/batch', json=payload)
+    assert response.status_code == 202
+    assert isinstance(response.json(), list)
+    assert len(response.json()) == 3
+
+def test_handle_event_batch_invalid_event():
+    payload = [{"event_name": "push_event"}]
+    response = requests.post(f'{BASE_URL}/batch', json=payload)
+    assert response.status_code == 422
+    assert 'detail' in response.json()
+
 def test_get_last_event():
     response = requests.get(f'{BASE_URL}/last')
     assert response.status_code == 200
@@ -53,3 +74,13 @@ def test_list_messages_no_messages():
     response = requests.get(f'{BASE_URL}/list_messages')
     assert response.status_code == 404
     assert response.json() == []
+
+def test_replay_events_unauthorized():
+    payload = {"start": "2024-11-15T08:00:00Z", "end": "2024-11-15T10:00:00Z"}
+    response = requests.post(f'{BASE_URL}/replay', json=payload)
+    assert response.status_code == 401
+
+def test_explain_event_unauthorized():
+    payload = {"event_name": "new_issue", "service": "github", "params": {"repo": "AREA"}, "context_params": {}}
+    response = requests.post(f'{BASE_URL}/explain', json=payload)
+    assert response.status_code == 401
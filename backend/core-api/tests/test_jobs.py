@@ -0,0 +1,19 @@
+import requests
+
+BASE_URL = 'http://area-core-api:8080/api/v1/jobs'
+
+def test_get_queue_metrics_unauthorized():
+    response = requests.get(f"{BASE_URL}/metrics")
+    assert response.status_code == 401
+
+def test_get_dead_letters_unauthorized():
+    response = requests.get(f"{BASE_URL}/dead_letters")
+    assert response.status_code == 401
+
+def test_replay_dead_letters_unauthorized():
+    response = requests.post(f"{BASE_URL}/dead_letters/replay", json={"limit": 10})
+    assert response.status_code == 401
+
+def test_get_reaction_latency_stats_unauthorized():
+    response = requests.get(f"{BASE_URL}/reactions/latency", params={"window_seconds": 3600, "bucket_seconds": 600})
+    assert response.status_code == 401
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from src.llm.utils import EventContentCache
+from src.llm.utils import get_event_content_key
+from src.llm.utils import personalize_content
+
+
+def test_event_content_key_ignores_param_order():
+    assert get_event_content_key("send_email", "push_event", {"repo": "AREA", "commit": "abc"}) == (
+        get_event_content_key("send_email", "push_event", {"commit": "abc", "repo": "AREA"})
+    )
+    assert get_event_content_key("send_email", "push_event", {}) != get_event_content_key("send_sms", "push_event", {})
+
+def test_personalize_content():
+    user = SimpleNamespace(first_name="Ada", username="ada")
+    assert personalize_content("Dear {first_name}, {username} pushed.", user) == "Dear Ada, ada pushed."
+    assert personalize_content("Dear {first_name},", SimpleNamespace(first_name=None, username="ada")) == "Dear ada,"
+
+def test_get_or_generate_once_per_event():
+    cache = EventContentCache(ttl=60, max_entries=10)
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def generate():
+        calls.append(1)
+        return "content"
+
+    def reaction():
+        barrier.wait()
+        assert cache.get_or_generate("push", generate) == "content"
+
+    threads = [threading.Thread(target=reaction) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+def test_aget_or_generate_once_per_event():
+    cache = EventContentCache(ttl=60, max_entries=10)
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "content"
+
+    async def fan_out():
+        return await asyncio.gather(*(cache.aget_or_generate("push", generate) for _ in range(8)))
+
+    assert asyncio.run(fan_out()) == ["content"] * 8
+    assert len(calls) == 1
+
+def test_failed_generation_is_not_cached():
+    cache = EventContentCache(ttl=60, max_entries=10)
+
+    def fail():
+        raise RuntimeError("openai down")
+
+    try:
+        cache.get_or_generate("push", fail)
+    except RuntimeError:
+        pass
+    assert cache.get("push") is None
+    assert cache.get_or_generate("push", lambda: "content") == "content"
+
+def test_failed_generation_retried_by_one_waiter_at_a_time():
+    cache = EventContentCache(ttl=60, max_entries=10)
+    started = threading.Event()
+    release = threading.Event()
+    running = []
+    overlaps = []
+
+    def generate():
+        if running:
+            overlaps.append(1)
+        running.append(1)
+        started.set()
+        release.wait(1)
+        time.sleep(0.02)
+        running.pop()
+        raise RuntimeError("openai down")
+
+    def reaction():
+        try:
+            cache.get_or_generate("push", generate)
+        except RuntimeError:
+            pass
+
+    first = threading.Thread(target=reaction)
+    first.start()
+    started.wait(1)
+    # Waiters queued while the first generation runs, then a caller arriving right after it failed
+    waiters = [threading.Thread(target=reaction) for _ in range(3)]
+    for thread in waiters:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    first.join()
+    late = threading.Thread(target=reaction)
+    late.start()
+    for thread in waiters + [late]:
+        thread.join()
+    assert not overlaps
+    assert not cache._key_locks
+
+def test_expiry_and_eviction():
+    cache = EventContentCache(ttl=0, max_entries=10)
+    cache.set("push", "content")
+    assert cache.get("push") is None
+
+    cache = EventContentCache(ttl=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    assert cache.get("a") is None
+    assert cache.get("c") == "c"
@@ -0,0 +1,43 @@
+import smtplib
+
+import httpx
+import pytest
+
+from src.provider.circuit_breaker import CIRCUIT_CLOSED
+from src.provider.circuit_breaker import CIRCUIT_OPEN
+from src.provider.circuit_breaker import circuit_breakers
+from src.provider.config import provider_setting
+from src.provider.service import is_provider_failure
+from src.provider.service import provider_call
+
+
+def twilio_error(status_code):
+    request = httpx.Request("POST", "https://api.twilio.com/2010-04-01/Accounts/AC/Messages.json")
+    response = httpx.Response(status_code, request=request)
+    return httpx.HTTPStatusError(f"{status_code} from Twilio", request=request, response=response)
+
+def call_failing(provider, error):
+    with pytest.raises(type(error)), provider_call(provider):
+        raise error
+
+def test_client_errors_do_not_open_the_circuit():
+    breaker = circuit_breakers.get("test_client_errors")
+    # Bad phone numbers and bad params of more users than the failure threshold
+    for _ in range(provider_setting.PROVIDER_FAILURE_THRESHOLD + 1):
+        call_failing("test_client_errors", twilio_error(400))
+        call_failing("test_client_errors", ValueError("Invalid phone number"))
+    assert breaker.state == CIRCUIT_CLOSED
+
+    for _ in range(provider_setting.PROVIDER_FAILURE_THRESHOLD):
+        call_failing("test_client_errors", twilio_error(503))
+    assert breaker.state == CIRCUIT_OPEN
+
+def test_is_provider_failure():
+    assert is_provider_failure(httpx.ConnectError("connection refused"))
+    assert is_provider_failure(TimeoutError())
+    assert is_provider_failure(twilio_error(500))
+    assert is_provider_failure(twilio_error(429))
+    assert is_provider_failure(smtplib.SMTPServerDisconnected("Connection unexpectedly closed"))
+    assert not is_provider_failure(twilio_error(400))
+    assert not is_provider_failure(smtplib.SMTPRecipientsRefused({"bad@example": (550, b"No such user")}))
+    assert not is_provider_failure(KeyError("recipient"))
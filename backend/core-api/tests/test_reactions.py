@@ -0,0 +1,245 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+
+from src.database import SessionLocal
+from src.database import engine
+from src.event.schemas import EventPayload
+from src.job.config import JOB_PENDING
+from src.job.config import JOB_RUNNING
+from src.job.config import job_setting
+from src.job.models import ReactionDeadLetter
+from src.job.models import ReactionJob
+from src.job.service import enqueue_reaction_jobs
+from src.job.utils import Shutdown
+from src.provider.service import mark_send_started
+from src.reaction_general import send_email as send_email_module
+from src.task import service as task_service
+from src.task.models import Task
+from src.task.service import execute_actions
+from src.task.service import execute_reaction_job
+from src.task.service import load_reaction_tasks
+from src.user.models import User
+
+pytestmark = pytest.mark.database
+
+
+@pytest.fixture(scope="module")
+def task_ids():
+    with SessionLocal() as db:
+        user = User(
+            username=f"reactions_{uuid.uuid4().hex[:8]}",
+            email="reactions@example.com",
+            first_name="Reactions",
+            last_name="Test",
+            role="user",
+            hashed_password="not-a-hash",
+        )
+        db.add(user)
+        db.flush()
+        tasks = [
+            Task(
+                trigger="push_event",
+                event_hash=f"reactions_{user.id}",
+                action_name="send_email",
+                service="github",
+                user_id=user.id,
+            )
+            for _ in range(25)
+        ]
+        db.add_all(tasks)
+        db.commit()
+        ids = [task.id for task in tasks]
+        user_id = user.id
+
+    yield ids
+
+    with SessionLocal() as db:
+        db.delete(db.get(User, user_id))  # The tasks are deleted with the user
+        db.commit()
+
+def count_queries(func):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = func()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return result, len(statements)
+
+@pytest.fixture
+def delivered(monkeypatch):
+    deliveries = []
+
+    async def deliver(task=None, tasks=None, **kwargs):
+        # Reads the context of the reactions, it must come prefetched
+        deliveries.append([(task.id, task.user.username, task.user.token) for task in tasks or [task]])
+
+    monkeypatch.setattr(task_service, "get_action_func", lambda service, action_name: (deliver, True))
+    monkeypatch.setattr(task_service, "record_reaction_execution", lambda *args, **kwargs: None)  # Batched writer
+    return deliveries
+
+def process_event(event_hash, task_ids):
+    # What `/events` and the worker do for an event matched by `task_ids`: queue, claim and execute its jobs
+    push = EventPayload(event_name="push_event", service="github", params={"repo": "AREA"}, context_params={})
+    with SessionLocal(expire_on_commit=False) as db:
+        enqueue_reaction_jobs(db, [(push, event_hash, [SimpleNamespace(id=task_id) for task_id in task_ids])])
+        db.commit()
+        jobs = db.query(ReactionJob).filter(ReactionJob.event_hash == event_hash).all()
+        for job in jobs:
+            job.status = JOB_RUNNING
+            job.attempts += 1
+        db.commit()
+    asyncio.run(execute_actions(jobs))
+
+def test_event_fixed_query_count(task_ids, delivered):
+    event_hashes = [f"fanout_{uuid.uuid4().hex[:8]}" for _ in range(2)]
+    try:
+        _, single_queries = count_queries(lambda: process_event(event_hashes[0], task_ids[:1]))
+        _, fanout_queries = count_queries(lambda: process_event(event_hashes[1], task_ids))
+    finally:
+        with SessionLocal() as db:
+            db.query(ReactionJob).filter(ReactionJob.event_hash.in_(event_hashes)).delete(synchronize_session=False)
+            db.commit()
+
+    assert single_queries == fanout_queries
+    assert [[task_id for task_id, _, _ in delivery] for delivery in delivered] == [task_ids[:1], task_ids]
+
+def test_enqueue_groups_reactions_per_user_and_event(task_ids):
+    event_hash = f"grouping_{uuid.uuid4().hex[:8]}"
+    push = EventPayload(event_name="push_event", service="github", params={"repo": "AREA"}, context_params={})
+    other_push = EventPayload(event_name="push_event", service="github", params={"repo": "Other"}, context_params={})
+    matched_events = [
+        (push, event_hash, [SimpleNamespace(id=task_id) for task_id in task_ids[:3]]),
+        (other_push, event_hash, [SimpleNamespace(id=task_ids[0])]),
+    ]
+
+    with SessionLocal() as db:
+        assert enqueue_reaction_jobs(db, matched_events) == 2
+        jobs = db.query(ReactionJob).filter(ReactionJob.event_hash == event_hash).order_by(ReactionJob.id).all()
+        # One job for the 3 send_email tasks of the user on the first push, a single task one for the other push
+        assert [(job.task_id, job.task_ids) for job in jobs] == [(task_ids[0], task_ids[:3]), (task_ids[0], None)]
+        db.rollback()
+
+@pytest.fixture
+def failing_smtp(monkeypatch):
+    async def generate_email_content(task, db=None, **kwargs):
+        return "content"
+
+    async def refuse_connection(*args, **kwargs):
+        raise ConnectionRefusedError("SMTP server unreachable")
+
+    monkeypatch.setattr(send_email_module, "generate_email_content", generate_email_content)
+    monkeypatch.setattr(send_email_module, "validate_email", lambda email: SimpleNamespace(email=email))
+    monkeypatch.setattr(send_email_module.aiosmtplib, "send", refuse_connection)
+
+def claim_job(task_id, attempts):
+    with SessionLocal(expire_on_commit=False) as db:
+        task = load_reaction_tasks(db, [task_id])[task_id]
+        job = ReactionJob(
+            task_id=task_id,
+            user_id=task.user_id,
+            event_name="push_event",
+            service="github",
+            event_hash=task.event_hash,
+            params={},
+            status=JOB_RUNNING,
+            attempts=attempts,
+            locked_by="test-worker",
+            locked_at=datetime.now(timezone.utc),
+        )
+        db.add(job)
+        db.commit()
+    return job, task
+
+def run_claimed_job(task_id, attempts):
+    job, task = claim_job(task_id, attempts)
+    asyncio.run(execute_reaction_job(job, task))
+    return job.id
+
+def test_provider_failure_is_retried_then_dead_lettered(task_ids, failing_smtp):
+    job_id = run_claimed_job(task_ids[0], attempts=1)
+    with SessionLocal() as db:
+        job = db.get(ReactionJob, job_id)
+        assert job.status == JOB_PENDING
+        assert job.run_at > datetime.now(timezone.utc)
+        assert job.last_error.startswith("ConnectionRefusedError")
+
+    job_id = run_claimed_job(task_ids[0], attempts=job_setting.JOB_MAX_ATTEMPTS)
+    with SessionLocal() as db:
+        assert db.get(ReactionJob, job_id) is None
+        dead_letter = db.query(ReactionDeadLetter).filter(ReactionDeadLetter.job_id == job_id).one()
+        assert dead_letter.attempts == job_setting.JOB_MAX_ATTEMPTS
+        assert dead_letter.last_error.startswith("ConnectionRefusedError")
+
+def test_reactions_interrupted_by_shutdown_give_up_their_lease(task_ids, monkeypatch):
+    sending_job, _ = claim_job(task_ids[0], attempts=1)
+    waiting_job, _ = claim_job(task_ids[1], attempts=1)
+    stopping = Shutdown(drain_seconds=0)
+    started = []
+
+    async def reaction(task=None, **kwargs):
+        if task.id == task_ids[0]:
+            mark_send_started("smtp", True)
+        started.append(task.id)
+        if len(started) == 2:
+            stopping.set()  # SIGTERM while both reactions run, past the drain budget right away
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(task_service, "get_action_func", lambda service, action_name: (reaction, True))
+    monkeypatch.setattr(task_service, "record_reaction_execution", lambda *args, **kwargs: None)
+
+    assert asyncio.run(execute_actions([sending_job, waiting_job], stopping)) == []
+    with SessionLocal() as db:
+        # The email may have been sent, it is not run again
+        assert db.get(ReactionJob, sending_job.id) is None
+        dead_letter = db.query(ReactionDeadLetter).filter(ReactionDeadLetter.job_id == sending_job.id).one()
+        assert dead_letter.last_error.startswith("ReactionTimeoutError")
+
+        job = db.get(ReactionJob, waiting_job.id)
+        assert job.status == JOB_PENDING
+        assert job.locked_by is None
+        assert job.last_error.endswith("(nothing sent yet)")
+        db.delete(job)
+        db.commit()
+
+def test_concurrent_events_coalesce_into_one_job(task_ids):
+    task_id = task_ids[2]
+    event_hash = f"coalescing_{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as db:
+        db.get(Task, task_id).coalesce_seconds = 60
+        db.commit()
+
+    def enqueue(repo, db):
+        push = EventPayload(event_name="push_event", service="github", params={"repo": repo}, context_params={})
+        return enqueue_reaction_jobs(db, [(push, event_hash, [SimpleNamespace(id=task_id)])])
+
+    try:
+        # Two requests process an event of the task at once, the second one waits for the commit of the first
+        with SessionLocal() as first, SessionLocal() as second, ThreadPoolExecutor(max_workers=1) as executor:
+            assert enqueue("AREA", first) == 1
+            second_enqueue = executor.submit(lambda: (enqueue("Other", second), second.commit()))
+            time.sleep(0.5)
+            assert not second_enqueue.done()
+            first.commit()
+            assert second_enqueue.result(timeout=10)[0] == 0  # Merged into the job of the first event
+
+        with SessionLocal() as db:
+            jobs = db.query(ReactionJob).filter(ReactionJob.event_hash == event_hash).all()
+            assert [(job.params["repo"], job.params["coalesced_events"]) for job in jobs] == [("AREA\nOther", "2")]
+    finally:
+        with SessionLocal() as db:
+            db.query(ReactionJob).filter(ReactionJob.event_hash == event_hash).delete(synchronize_session=False)
+            db.get(Task, task_id).coalesce_seconds = None
+            db.commit()
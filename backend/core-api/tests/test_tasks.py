@@ -97,6 +97,29 @@ def test_update_task(auth_token):
     # Clean up
     requests.delete(f'{BASE_URL}/{task_id}', headers=headers)
 
+def test_update_task_digest_not_supported(auth_token):
+    headers = {'Authorization': f'Bearer {auth_token}'}
+    payload = {
+        "trigger": "push_event",
+        "trigger_args": ["arg1", "arg2"],
+        "action_name": "send_email",
+        "action_params": None,
+        "user_id": 1,
+        "params": {"service": "github"},
+        "digest_seconds": 3600
+    }
+    response = requests.post(BASE_URL, json=payload, headers=headers)
+    task_id = response.json()['task_id']
+    # The task keeps its digest_seconds, the new reaction does not support the digest mode
+    response = requests.patch(f'{BASE_URL}/tasks/{task_id}', json={"action_name": "send_usdc"}, headers=headers)
+    assert response.status_code == 400
+    response = requests.patch(
+        f'{BASE_URL}/tasks/{task_id}', json={"action_name": "send_usdc", "digest_seconds": None}, headers=headers
+    )
+    assert response.status_code == 200
+    # Clean up
+    requests.delete(f'{BASE_URL}/{task_id}', headers=headers)
+
 def test_delete_task(auth_token):
     headers = {'Authorization': f'Bearer {auth_token}'}
     # Create a task to delete
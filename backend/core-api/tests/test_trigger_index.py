@@ -0,0 +1,153 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.task.index import PatternTrie
+from src.task.index import TaskDescriptor
+from src.task.index import TriggerIndex
+
+
+def descriptor(task_id):
+    return TaskDescriptor(task_id, 1, "send_email", "github")
+
+@pytest.fixture
+def trie():
+    trie = PatternTrie()
+    trie.add("push_event", ["octocat", "*"], descriptor(1))
+    trie.add("push_event", ["*", "hello-world"], descriptor(2))
+    trie.add("push_event", ["octocat", "hello-*"], descriptor(3))
+    trie.add("push_event", ["oct?cat", "*"], descriptor(4))
+    trie.add("pull_request_to_main", ["octocat", "*"], descriptor(5))
+    return trie
+
+def matched_ids(trie, trigger, values):
+    return sorted(task.id for task in trie.match(trigger, values))
+
+def test_match_patterns(trie):
+    assert matched_ids(trie, "push_event", ["octocat", "hello-world"]) == [1, 2, 3, 4]
+    assert matched_ids(trie, "push_event", ["octocat", "spoon-knife"]) == [1, 4]
+    assert matched_ids(trie, "push_event", ["github", "hello-world"]) == [2]
+    assert matched_ids(trie, "pull_request_to_main", ["octocat", "hello-world"]) == [5]
+
+def test_match_requires_same_argument_count(trie):
+    assert matched_ids(trie, "push_event", ["octocat"]) == []
+    assert matched_ids(trie, "push_event", ["octocat", "hello-world", "main"]) == []
+
+def test_match_ignores_argument_order(trie):
+    assert matched_ids(trie, "push_event", ["hello-world", "octocat"]) == [1, 2, 3, 4]
+    trie.add("push_event", ["main", "*"], descriptor(6))
+    trie.add("push_event", ["*", "main"], descriptor(7))
+    assert matched_ids(trie, "push_event", ["main", "zeta"]) == [6, 7]
+    assert matched_ids(trie, "push_event", ["zeta", "main"]) == [6, 7]
+
+def test_match_globs_by_prefix():
+    trie = PatternTrie()
+    for task_id in range(100):
+        trie.add("push_event", [f"repo-{task_id}-*"], descriptor(task_id))
+    trie.add("push_event", ["*-main"], descriptor(100))
+    assert matched_ids(trie, "push_event", ["repo-42-main"]) == [42, 100]
+    assert matched_ids(trie, "push_event", ["other"]) == []
+
+def test_unknown_trigger(trie):
+    assert matched_ids(trie, "ci_cd_pipeline", ["octocat", "hello-world"]) == []
+
+def test_remove(trie):
+    trie.remove("push_event", ["octocat", "*"], 1)
+    trie.remove("push_event", ["octocat", "hello-*"], 3)
+    assert matched_ids(trie, "push_event", ["octocat", "hello-world"]) == [2, 4]
+    assert sorted(task.id for task in trie.descriptors()) == [2, 4, 5]
+
+def test_match_while_tasks_change(trie):
+    errors = []
+    done = threading.Event()
+
+    def change_tasks():
+        for task_id in range(10, 2000):
+            trie.add("push_event", [f"hello-*{task_id}", "*"], descriptor(task_id))
+            trie.remove("push_event", [f"hello-*{task_id - 5}", "*"], task_id - 5)
+        done.set()
+
+    def match_events():
+        try:
+            while not done.is_set():
+                matched_ids(trie, "push_event", ["octocat", "hello-1999"])
+        except RuntimeError as e:  # dictionary changed size during iteration
+            errors.append(e)
+
+    threads = [threading.Thread(target=change_tasks), threading.Thread(target=match_events)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert matched_ids(trie, "push_event", ["octocat", "hello-1999"]) == [1, 3, 4, 1999]
+
+class FakeSession:
+    """Returns `tasks` to the rebuild of the index, `during_query` runs while the query is in flight."""
+
+    def __init__(self, tasks, during_query=None):
+        self.tasks = tasks
+        self.during_query = during_query
+
+    def query(self, *columns):
+        return self
+
+    def all(self):
+        if self.during_query is not None:
+            self.during_query()
+        return [
+            (task.id, task.event_hash, task.user_id, task.action_name, task.service, task.trigger, task.trigger_args)
+            for task in self.tasks
+        ]
+
+def task(task_id, event_hash, trigger_args=None):
+    return SimpleNamespace(
+        id=task_id,
+        event_hash=event_hash,
+        user_id=1,
+        action_name="send_email",
+        service="github",
+        trigger="push_event",
+        trigger_args=trigger_args,
+    )
+
+def test_rebuild_replays_concurrent_changes():
+    index = TriggerIndex()
+    index.build(FakeSession([task(1, "hash_1")]))
+
+    def change_tasks():
+        # Committed after the snapshot of the rebuild was read
+        index.add(task(2, "hash_2"))
+        index.add(task(3, None, ["octocat", "*"]))
+        index.remove(1)
+
+    index.build(FakeSession([task(1, "hash_1")], during_query=change_tasks))
+
+    assert index.lookup("hash_1") == ()
+    assert [descriptor.id for descriptor in index.lookup("hash_2")] == [2]
+    assert [descriptor.id for descriptor in index.match_patterns("push_event", ["octocat", "hello-world"])] == [3]
+
+def test_failed_rebuild_keeps_current_index():
+    index = TriggerIndex()
+    index.build(FakeSession([task(1, "hash_1")]))
+
+    with pytest.raises(TypeError):
+        # The event_hash of a task is missing, changes are made while the table is read
+        index.build(FakeSession([task(2, None)], during_query=lambda: index.add(task(3, "hash_3"))))
+
+    assert index._changes is None  # No longer recorded
+    assert [descriptor.id for descriptor in index.lookup("hash_1")] == [1]
+    assert [descriptor.id for descriptor in index.lookup("hash_3")] == [3]
+
+def test_ensure_fresh_single_rebuild():
+    index = TriggerIndex()
+    index.build(FakeSession([task(1, "hash_1")]))
+    index._built_at -= 3600  # Stale
+
+    with index._build_lock:  # Another request is rebuilding it
+        index.ensure_fresh(FakeSession([]))
+    assert [descriptor.id for descriptor in index.lookup("hash_1")] == [1]
+
+    index.ensure_fresh(FakeSession([]))
+    assert index.lookup("hash_1") == ()
@@ -4,6 +4,10 @@ from src.config import EnvFileLoader
 
 class WebhookSetting(EnvFileLoader):
     CUSTOM_ENV_VAR: str
+    # core-api answers 429 + Retry-After when it is overloaded, the events are posted again with backoff
+    CORE_API_MAX_RETRIES: int = 4
+    CORE_API_BACKOFF_SECONDS: float = 0.5  # First delay when core-api gives no Retry-After, doubled every retry
+    CORE_API_RETRY_BUDGET_SECONDS: float = 8.0  # Total wait, webhook senders time out after 10 seconds
 
 
 webhook_setting = WebhookSetting()
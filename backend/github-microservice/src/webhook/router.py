@@ -2,7 +2,6 @@
 import hashlib
 import hmac
 
-import requests
 from fastapi import APIRouter
 from fastapi import HTTPException
 from fastapi import Request
@@ -13,6 +12,7 @@ from src.webhook.schemas import EventPayload
 from src.webhook.schemas import PullRequestEvent
 from src.webhook.schemas import PushEvent
 from src.webhook.schemas import WorkflowRunEvent
+from src.webhook.service import post_to_core_api
 
 router = APIRouter(prefix="/webhook", tags=["Webhook"])
 
@@ -148,18 +148,21 @@ async def webhook_listener(request: Request):
         print(f"Unhandled event type: {event_type}")
         return {"status": "ignored"}
 
+    # Same id on the redeliveries of the webhook
+    eventPayload.delivery_id = request.headers.get("X-GitHub-Delivery")
     print(eventPayload)
     print(eventPayload.model_dump())
 
-    response = requests.post(
-        "http://area-core-api:8080/api/v1/events", json=eventPayload.model_dump()
+    response = await post_to_core_api(
+        "http://area-core-api:8080/api/v1/events", eventPayload.model_dump()
     )
     print(response)
 
-    if response.status_code != 200:
+    if response.status_code not in (200, 202):  # core-api answers 202 once the event is queued
         raise HTTPException(
             status_code=response.status_code,
             detail=f"Failed to post event: {response.text}",
+            headers={"Retry-After": response.headers["Retry-After"]} if "Retry-After" in response.headers else None,
         )
 
     return {"status": "success"}
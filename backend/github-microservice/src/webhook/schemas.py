@@ -11,6 +11,7 @@ class EventPayload(BaseModel):
     service: str
     params: Dict[str, str]
     context_params: Dict[str, str]
+    delivery_id: Optional[str] = None  # X-GitHub-Delivery, core-api handles a delivery only once
 
 # PUSH_EVENT
 
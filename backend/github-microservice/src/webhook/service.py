@@ -1,6 +1,11 @@
 # package-specific business logic
+import asyncio
+import random
+
+import httpx
 import requests
 from src.config import src_setting
+from src.webhook.config import webhook_setting
 
 def repository_create_webhook(args: list, event: str, oauth_token: str):
     print("args sended from the frontend", args)
@@ -71,3 +76,31 @@ def repository_create_webhook(args: list, event: str, oauth_token: str):
     else:
         print(f"Failed to create webhook: {response.status_code}")
         print(response.json())
+
+
+async def post_to_core_api(url: str, payload) -> httpx.Response:
+    """
+    Posts events to core-api. While core-api answers 429 (overloaded) the request is sent again after the
+    `Retry-After` delay, or an exponential backoff with jitter, as long as the retry budget allows it.
+    """
+    backoff = webhook_setting.CORE_API_BACKOFF_SECONDS
+    waited = 0.0
+
+    async with httpx.AsyncClient() as client:
+        for attempt in range(webhook_setting.CORE_API_MAX_RETRIES + 1):
+            response = await client.post(url, json=payload)
+            if response.status_code != 429 or attempt == webhook_setting.CORE_API_MAX_RETRIES:
+                return response
+
+            retry_after = response.headers.get("Retry-After", "")
+            delay = float(retry_after) if retry_after.isdigit() else backoff
+            delay += random.uniform(0, backoff)  # jitter, so the retried webhooks do not come back together
+            if waited + delay > webhook_setting.CORE_API_RETRY_BUDGET_SECONDS:
+                return response
+
+            print(f"core-api is overloaded, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            waited += delay
+            backoff *= 2
+
+    return response
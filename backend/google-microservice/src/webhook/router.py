@@ -7,7 +7,6 @@ import json
 from typing import List
 from typing import Tuple
 
-import requests
 from fastapi import APIRouter
 from fastapi import Header
 from fastapi import HTTPException
@@ -27,6 +26,7 @@ from src.webhook.schemas import EmailReceivedEvent
 from src.webhook.schemas import EventPayload
 from src.webhook.schemas import Message
 from src.webhook.utils import get_user_info_by_userid
+from src.webhook.utils import post_to_core_api
 from src.webhook.utils import store_watch_info
 
 router = APIRouter(prefix="/webhook", tags=["Webhook"])
@@ -123,23 +123,26 @@ async def webhook_listener(request: Request):
         user_email_address, from_email, last_history_id, creds, user_id
     )
 
-    # Store the new historyId
-    await store_watch_info(payload_json, new_history_id, "", user_id)
-
-    for eventPayload in eventPayloads:
-        if eventPayload:
-            print("Posting event to core-api")
-            print(eventPayload)
-
-            print("EMULATE POSTING EVENT TO CORE API")
-            response = requests.post("http://area-core-api:8080/api/v1/events", json=eventPayload.dict())
-            print(response)
+    eventPayloads = [eventPayload for eventPayload in eventPayloads if eventPayload]
+    if eventPayloads:
+        # All the messages of the history page are sent to core-api in one request
+        print(f"Posting {len(eventPayloads)} events to core-api")
+        response = await post_to_core_api(
+            "http://area-core-api:8080/api/v1/events/batch",
+            [eventPayload.dict() for eventPayload in eventPayloads],
+        )
+        print(response)
+
+        # Pub/Sub redelivers the notification later if core-api is still overloaded after the retries
+        if response.status_code not in (200, 202):  # core-api answers 202 once the events are queued
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Failed to post events: {response.text}",
+                headers={"Retry-After": response.headers["Retry-After"]} if "Retry-After" in response.headers else None,
+            )
 
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Failed to post event: {response.text}",
-                )
+    # Store the new historyId only once core-api accepted the events: a redelivered notification fetches them again
+    await store_watch_info(payload_json, new_history_id, "", user_id)
     return {"status": "success"}
 
 
@@ -1,12 +1,16 @@
 # Description: Utility functions for setting up and managing Gmail watch (making sure the watch is active and renewing it if necessary, normally its 7 days).
+import asyncio
 import datetime
 import json
 import os
+import random
 
 import aiohttp
 import httpx
 import requests
 
+from src.webhook.config import webhook_setting
+
 core_api = "http://area-core-api:8080/api/v1"
 
 
@@ -165,3 +169,31 @@ async def get_stored_history_id(email_address):
 #     "resource_id": "resource_id_value"
 #   }
 # }
+
+
+async def post_to_core_api(url: str, payload) -> httpx.Response:
+    """
+    Posts events to core-api. While core-api answers 429 (overloaded) the request is sent again after the
+    `Retry-After` delay, or an exponential backoff with jitter, as long as the retry budget allows it.
+    """
+    backoff = webhook_setting.CORE_API_BACKOFF_SECONDS
+    waited = 0.0
+
+    async with httpx.AsyncClient() as client:
+        for attempt in range(webhook_setting.CORE_API_MAX_RETRIES + 1):
+            response = await client.post(url, json=payload)
+            if response.status_code != 429 or attempt == webhook_setting.CORE_API_MAX_RETRIES:
+                return response
+
+            retry_after = response.headers.get("Retry-After", "")
+            delay = float(retry_after) if retry_after.isdigit() else backoff
+            delay += random.uniform(0, backoff)  # jitter, so the retried webhooks do not come back together
+            if waited + delay > webhook_setting.CORE_API_RETRY_BUDGET_SECONDS:
+                return response
+
+            print(f"core-api is overloaded, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            waited += delay
+            backoff *= 2
+
+    return response
@@ -0,0 +1,71 @@
+import asyncio
+import base64
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from src.webhook import router
+from src.webhook.schemas import EventPayload
+
+
+class FakeRequest:
+    def __init__(self, envelope):
+        self.envelope = envelope
+
+    async def json(self):
+        return self.envelope
+
+def notification(history_id):
+    data = json.dumps({"emailAddress": "ada@example.com", "historyId": history_id}).encode()
+    return FakeRequest(
+        {
+            "message": {"data": base64.b64encode(data).decode()},
+            "subscription": "projects/area/subscriptions/EMAIL_SUBSCRIPTION_1",
+        }
+    )
+
+def test_history_id_kept_until_core_api_accepts_the_events(monkeypatch):
+    stored = {"history_id": "100"}
+    fetched_from = []
+    responses = [httpx.Response(429, headers={"Retry-After": "1"}), httpx.Response(202)]
+
+    async def get_user_info_by_userid(user_id):
+        return {
+            "email": "ada@example.com",
+            "token": {"google_token": {"access_token": "token"}},
+            "gmail_webhook_info": {"gmail_history_id": stored["history_id"]},
+        }
+
+    def process_gmail_changes(user_email_address, from_email, start_history_id, creds, user_id):
+        fetched_from.append(start_history_id)
+        event = EventPayload(
+            event_name="email_received",
+            service="google",
+            params={"email": user_email_address},
+            context_params={"subject": "Hi"},
+            processed_message_info={"message_id": "m1", "user_id": str(user_id)},
+        )
+        return [event], "200"
+
+    async def post_to_core_api(url, payload):
+        return responses.pop(0)
+
+    async def store_watch_info(response, history_id, resource_id, user_id):
+        stored["history_id"] = history_id
+
+    monkeypatch.setattr(router, "get_user_info_by_userid", get_user_info_by_userid)
+    monkeypatch.setattr(router, "process_gmail_changes", process_gmail_changes)
+    monkeypatch.setattr(router, "post_to_core_api", post_to_core_api)
+    monkeypatch.setattr(router, "store_watch_info", store_watch_info)
+
+    # core-api is still overloaded after the retries, Pub/Sub redelivers the notification
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(router.webhook_listener(notification("150")))
+    assert error.value.status_code == 429
+    assert stored["history_id"] == "100"
+
+    assert asyncio.run(router.webhook_listener(notification("150"))) == {"status": "success"}
+    assert fetched_from == ["100", "100"]  # The redelivery fetches the same messages again
+    assert stored["history_id"] == "200"